@@ -0,0 +1,90 @@
+"""
+Generates a corpus of .docx files for the benchmarks.
+
+Documents vary in page count, image count and table density so the effect
+of a change can be seen across the kinds of documents users send.
+
+    python benchmarks/corpus.py --output benchmarks/corpus
+"""
+import argparse
+import os
+import random
+import struct
+import zlib
+from io import BytesIO
+
+# name: (pages, images per page, tables per page)
+PROFILES = {
+    'small-text': (1, 0, 0),
+    'medium-text': (10, 0, 0),
+    'large-text': (60, 0, 0),
+    'images': (10, 2, 0),
+    'tables': (10, 0, 3),
+    'mixed': (30, 1, 1),
+}
+
+
+def make_png(width: int, height: int, rng: random.Random) -> bytes:
+    """
+    Returns a noisy grayscale PNG, which compresses about as badly as a photo.
+    """
+    rows = b''.join(b'\x00' + rng.randbytes(width) for _ in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+
+def make_docx(path: str, pages: int, images: int, tables: int, seed: int):
+    from docx import Document
+    from docx.shared import Inches
+
+    rng = random.Random(seed)
+    words = ['contract', 'party', 'agreement', 'clause', 'term', 'payment', 'notice', 'service',
+             'delivery', 'liability', 'schedule', 'invoice', 'renewal', 'period', 'the', 'of', 'and']
+    document = Document()
+    document.add_heading(f"Benchmark document {seed}", level=1)
+    for page in range(pages):
+        document.add_heading(f"Section {page + 1}", level=2)
+        for _ in range(6):
+            document.add_paragraph(' '.join(rng.choice(words) for _ in range(60)).capitalize() + '.')
+        for _ in range(images):
+            document.add_picture(BytesIO(make_png(320, 200, rng)), width=Inches(3))
+        for _ in range(tables):
+            table = document.add_table(rows=6, cols=4)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = f"{rng.randint(0, 99999)}"
+        if page < pages - 1:
+            document.add_page_break()
+    document.save(path)
+
+
+def generate(output: str, copies: int = 1) -> list:
+    """
+    Writes copies documents of every profile to output and returns their paths.
+    """
+    os.makedirs(output, exist_ok=True)
+    paths = []
+    for name, (pages, images, tables) in PROFILES.items():
+        for copy in range(copies):
+            path = os.path.join(output, f"{name}-{copy}.docx")
+            if not os.path.exists(path):
+                make_docx(path, pages, images, tables, seed=zlib.crc32(f"{name}-{copy}".encode()))
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus'))
+    parser.add_argument('--copies', type=int, default=1, help="Documents per profile, each with different content.")
+    args = parser.parse_args()
+    for path in generate(args.output, args.copies):
+        print(f"{os.path.getsize(path) / 1024:>8.0f} KB  {path}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""
+Load test for the conversion, password and merge services.
+
+Sends requests from the generated .docx corpus (see corpus.py) to running
+services at a fixed concurrency and records throughput, p50/p95/p99 latency
+and the peak resident memory each service reports on /metrics. Results are
+written as JSON to benchmarks/results so runs can be compared:
+
+    python benchmarks/load_test.py --scenarios convert protect --concurrency 1 4 8
+    python benchmarks/load_test.py --compare results/before.json results/after.json
+
+Only the local services are contacted; start them first with docker-compose.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from corpus import generate
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ('convert', 'bulk_zip', 'bulk_merge', 'protect', 'merge')
+# Files sent per request by the bulk and merge scenarios
+BATCH_SIZE = 5
+PASSWORD = 'benchmark'
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+async def resident_memory(client: httpx.AsyncClient, url: str) -> int:
+    """
+    Returns process_resident_memory_bytes from a service's /metrics, or 0.
+    """
+    try:
+        resp = await client.get(f"{url}/metrics")
+        match = re.search(r'^process_resident_memory_bytes (\S+)$', resp.text, re.M)
+        return int(float(match.group(1))) if match else 0
+    except httpx.HTTPError:
+        return 0
+
+
+async def sample_memory(client: httpx.AsyncClient, urls: dict, peaks: dict, stop: asyncio.Event):
+    while not stop.is_set():
+        for name, url in urls.items():
+            peaks[name] = max(peaks.get(name, 0), await resident_memory(client, url))
+        try:
+            await asyncio.wait_for(stop.wait(), 0.25)
+        except asyncio.TimeoutError:
+            pass
+
+
+def request_for(scenario: str, args, docs: list, pdfs: list, i: int):
+    """
+    Returns (url, files, data) for the i-th request of a scenario.
+    """
+    def attach(field: str, paths: list, media_type: str) -> list:
+        return [(field, (os.path.basename(p), open(p, 'rb'), media_type)) for p in paths]
+
+    docx_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    batch = [docs[(i + k) % len(docs)] for k in range(BATCH_SIZE)]
+    if scenario == 'convert':
+        return f"{args.convert_url}/convert", attach('file', [docs[i % len(docs)]], docx_type), {}
+    if scenario == 'bulk_zip':
+        return f"{args.convert_url}/bulk_convert", attach('files', batch, docx_type), {'password': PASSWORD}
+    if scenario == 'bulk_merge':
+        return f"{args.convert_url}/bulk_convert", attach('files', batch, docx_type), {'merge': 'true'}
+    if scenario == 'protect':
+        return f"{args.password_url}/protect", attach('file', [pdfs[i % len(pdfs)]], 'application/pdf'), {'password': PASSWORD}
+    batch = [pdfs[(i + k) % len(pdfs)] for k in range(BATCH_SIZE)]
+    return f"{args.merge_url}/merge", attach('files', batch, 'application/pdf'), {}
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, concurrency: int, args, docs: list, pdfs: list) -> dict:
+    latencies = []
+    errors = 0
+    next_request = iter(range(args.requests))
+
+    async def worker():
+        nonlocal errors
+        for i in next_request:
+            url, files, data = request_for(scenario, args, docs, pdfs, i)
+            start = time.perf_counter()
+            try:
+                async with client.stream('POST', url, files=files, data=data) as resp:
+                    async for _ in resp.aiter_bytes():
+                        pass
+                if resp.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            finally:
+                for _, (_, f, _) in files:
+                    f.close()
+
+    urls = {'convert': args.convert_url, 'password': args.password_url, 'merge': args.merge_url}
+    peaks = {}
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_memory(client, urls, peaks, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampler
+
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': args.requests,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'peak_rss_mb': {name: round(rss / 2**20, 1) for name, rss in peaks.items()},
+    }
+
+
+async def prepare_pdfs(client: httpx.AsyncClient, args, docs: list) -> list:
+    """
+    Converts each corpus document once through /convert so the protect and
+    merge scenarios use the PDFs the pipeline actually produces.
+    """
+    pdf_dir = os.path.join(args.corpus, 'pdf')
+    os.makedirs(pdf_dir, exist_ok=True)
+    pdfs = []
+    for doc in docs:
+        path = os.path.join(pdf_dir, os.path.basename(doc).replace('.docx', '.pdf'))
+        if not os.path.exists(path):
+            with open(doc, 'rb') as f:
+                resp = await client.post(f"{args.convert_url}/convert", files={'file': (os.path.basename(doc), f)})
+            resp.raise_for_status()
+            with open(path, 'wb') as out:
+                out.write(resp.content)
+        pdfs.append(path)
+    return pdfs
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(results: list):
+    print(f"{'scenario':<12}{'conc':>5}{'err':>5}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  peak RSS MB")
+    for r in results:
+        rss = ' '.join(f"{name}={mb}" for name, mb in r['peak_rss_mb'].items())
+        print(f"{r['scenario']:<12}{r['concurrency']:>5}{r['errors']:>5}{r['throughput_rps']:>9}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}  {rss}")
+
+
+def compare(before_path: str, after_path: str):
+    """
+    Prints the change of each metric between two result files.
+    """
+    with open(before_path) as f:
+        before = {(r['scenario'], r['concurrency']): r for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = {(r['scenario'], r['concurrency']): r for r in json.load(f)['results']}
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+
+    print(f"{'scenario':<12}{'conc':>5}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        print(f"{key[0]:<12}{key[1]:>5}" + ''.join(
+            f"{change(old[m], new[m]):>10}" for m in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')))
+
+
+async def main(args):
+    docs = generate(args.corpus, args.copies)
+    results = []
+    # No client timeout: a slow run is a result, not an error
+    async with httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=max(args.concurrency) + 1)) as client:
+        pdfs = []
+        if {'protect', 'merge'} & set(args.scenarios):
+            pdfs = await prepare_pdfs(client, args, docs)
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                print(f"Running {scenario} at concurrency {concurrency}...")
+                results.append(await run_scenario(client, scenario, concurrency, args, docs, pdfs))
+
+    print_results(results)
+    os.makedirs(args.results, exist_ok=True)
+    path = os.path.join(args.results, f"{datetime.now():%Y%m%d-%H%M%S}-{git_revision()}.json")
+    with open(path, 'w') as f:
+        json.dump({
+            'revision': git_revision(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'host': {'platform': platform.platform(), 'cpus': os.cpu_count()},
+            'corpus': [os.path.basename(doc) for doc in docs],
+            'results': results,
+        }, f, indent=2)
+    print(f"Results saved to {path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--requests', type=int, default=20, help="Requests per scenario and concurrency level.")
+    parser.add_argument('--copies', type=int, default=1, help="Corpus documents per profile.")
+    parser.add_argument('--corpus', default=os.path.join(BENCH_DIR, 'corpus'))
+    parser.add_argument('--results', default=os.path.join(BENCH_DIR, 'results'))
+    parser.add_argument('--convert-url', default='http://localhost:8000')
+    parser.add_argument('--password-url', default='http://localhost:8001')
+    parser.add_argument('--merge-url', default='http://localhost:8002')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two result files and exit.")
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+    else:
+        asyncio.run(main(args))
\ No newline at end of file
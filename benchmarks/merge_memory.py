@@ -0,0 +1,105 @@
+"""
+Peak memory of merge_pdfs against total input size.
+
+Generates sets of PDFs that share an embedded image (like a letterhead logo),
+merges each set in a fresh process in both the default and the low-memory
+mode, and prints the peak RSS of each run.
+
+    python benchmarks/merge_memory.py --files 10 20 40 --pages 20
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'merge'))
+
+
+def make_pdf(path: str, pages: int, logo: bytes, seed: int):
+    from pypdf import PageObject, PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    image = DecodedStreamObject()
+    image.set_data(logo)
+    image.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Image'),
+        NameObject('/Width'): NumberObject(256),
+        NameObject('/Height'): NumberObject(len(logo) // 256),
+        NameObject('/ColorSpace'): NameObject('/DeviceGray'),
+        NameObject('/BitsPerComponent'): NumberObject(8),
+    })
+    image_ref = writer._add_object(image)
+    for _ in range(pages):
+        page = PageObject.create_blank_page(None, 612, 792)
+        text = ' '.join(f"{rng.random():.8f}" for _ in range(2000))
+        content = DecodedStreamObject()
+        content.set_data(f"q 100 0 0 100 50 650 cm /Logo Do Q BT /F1 8 Tf 50 600 Td ({text}) Tj ET".encode())
+        page[NameObject('/Contents')] = writer._add_object(content)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/XObject'): DictionaryObject({NameObject('/Logo'): image_ref}),
+        })
+        writer.add_page(page)
+    writer.write(path)
+
+
+def child(mode: str, output: str, paths: list):
+    from merge import merge_pdfs, open_mapped
+
+    start = time.perf_counter()
+    if mode == 'low-memory':
+        files = [open(path, 'rb') for path in paths]
+        merge_pdfs([open_mapped(f) for f in files], output, share_resources=True)
+    else:
+        contents = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                contents.append(f.read())
+        merged = merge_pdfs(contents)
+        with open(output, 'wb') as f:
+            f.write(merged)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{peak_kb} {elapsed:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, nargs='+', default=[5, 10, 20])
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--child', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.child[2:])
+        return
+
+    logo = random.Random(0).randbytes(256 * 256)
+    print(f"{'files':>5} {'input MB':>9} {'mode':>10} {'peak RSS MB':>12} {'output MB':>10} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for count in args.files:
+            paths = []
+            for i in range(count):
+                path = os.path.join(tmpdir, f"{count}_{i}.pdf")
+                make_pdf(path, args.pages, logo, seed=i)
+                paths.append(path)
+            input_mb = sum(os.path.getsize(path) for path in paths) / 2 ** 20
+            for mode in ('default', 'low-memory'):
+                output = os.path.join(tmpdir, f"merged_{count}_{mode}.pdf")
+                result = subprocess.run(
+                    [sys.executable, __file__, '--child', mode, output] + paths,
+                    check=True, capture_output=True, text=True
+                )
+                peak_kb, elapsed = result.stdout.split()
+                output_mb = os.path.getsize(output) / 2 ** 20
+                print(f"{count:>5} {input_mb:>9.1f} {mode:>10} {int(peak_kb) / 1024:>12.1f} {output_mb:>10.1f} {elapsed:>8}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
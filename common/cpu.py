@@ -0,0 +1,27 @@
+import os
+
+
+def cpu_quota() -> int:
+    """
+    Returns the number of CPUs available to this container.
+
+    Reads the cgroup CPU quota (v2 then v1) and falls back to os.cpu_count().
+    A fractional quota (e.g. 150m) is rounded up to one worker.
+    """
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            return max(1, -(-int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, -(-quota // period))
+    except (OSError, ValueError):
+        pass
+    return os.cpu_count() or 1
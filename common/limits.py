@@ -0,0 +1,32 @@
+import os
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.responses import JSONResponse
+
+# Upload limits
+MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE", 50 * 1024 * 1024))
+MAX_REQUEST_SIZE = int(os.environ.get("MAX_REQUEST_SIZE", 200 * 1024 * 1024))
+
+
+def install(app: FastAPI):
+    """
+    Rejects requests larger than MAX_REQUEST_SIZE with a 413. Install it before
+    metrics, so the metrics middleware wraps it and counts the rejections.
+    """
+
+    @app.middleware("http")
+    async def limit_request_size(request: Request, call_next):
+        # Reject oversized requests before the body is read
+        length = request.headers.get('content-length')
+        if length and length.isdigit() and int(length) > MAX_REQUEST_SIZE:
+            return JSONResponse(status_code=413, content={'detail': "Request too large."})
+        return await call_next(request)
+
+
+def upload_size(file: UploadFile) -> int:
+    """
+    Returns the size of an upload, leaving it positioned at the start.
+    """
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    return size
@@ -0,0 +1,95 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from fastapi import FastAPI, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', "Time from request start to the last byte of the response.",
+    ['method', 'path', 'status'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+IN_FLIGHT = Gauge('http_requests_in_flight', "Requests currently being handled.")
+STAGE_DURATION = Histogram(
+    'stage_duration_seconds', "Time spent in each processing stage.", ['stage'],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+BYTES_IN = Counter('http_request_bytes_total', "Request body bytes received.", ['path'])
+BYTES_OUT = Counter('http_response_bytes_total', "Response body bytes sent.", ['path'])
+
+# Stage timings of the current request, reported in its Server-Timing header
+_timings = contextvars.ContextVar('timings', default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times a block as the given stage, both in the stage_duration_seconds
+    histogram and in the current request's Server-Timing header.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.labels(name).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + elapsed
+
+
+def server_timing(timings: dict) -> str:
+    return ', '.join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings.items())
+
+
+def install(app: FastAPI):
+    """
+    Adds request metrics, the Server-Timing header and the /metrics endpoint to app.
+    """
+
+    @app.middleware("http")
+    async def record_metrics(request: Request, call_next):
+        if request.url.path == '/metrics':
+            return await call_next(request)
+        start = time.perf_counter()
+        timings = {}
+        _timings.set(timings)
+        IN_FLIGHT.inc()
+        try:
+            response = await call_next(request)
+        except Exception:
+            IN_FLIGHT.dec()
+            raise
+        route = request.scope.get('route')
+        path = route.path if route is not None else 'unmatched'
+        length = request.headers.get('content-length')
+        if length and length.isdigit():
+            BYTES_IN.labels(path).inc(int(length))
+        if timings:
+            response.headers['Server-Timing'] = server_timing(timings)
+
+        body = response.body_iterator
+
+        async def measured_body():
+            # The response stage covers sending the body to the client
+            sent = 0
+            send_start = time.perf_counter()
+            try:
+                async for chunk in body:
+                    sent += len(chunk)
+                    yield chunk
+            finally:
+                STAGE_DURATION.labels('response').observe(time.perf_counter() - send_start)
+                BYTES_OUT.labels(path).inc(sent)
+                REQUEST_LATENCY.labels(request.method, path, response.status_code).observe(time.perf_counter() - start)
+                IN_FLIGHT.dec()
+
+        response.body_iterator = measured_body()
+        return response
+
+    @app.get("/metrics")
+    async def metrics():
+        """
+        Endpoint exposing the service's metrics in the Prometheus text format.
+        """
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
@@ -1,186 +1,528 @@
 import os
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import ipaddress
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from typing import List
 from uuid import uuid4
 from zipfile import ZipFile
 import asyncio
-import requests
 from io import BytesIO
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from convert import *
+from jobs import JobsFull, job_manager
+from scratch import ScratchFull, scratch_space
+from chunking import number_pages
+from zipstream import stream_zip
+from limits import install as install_limits, MAX_FILE_SIZE, MAX_REQUEST_SIZE
+from metrics import install as install_metrics, stage
+from pipeline import open_http_client, close_http_client, protect_file, protect_files, merge_files, optimize_file, OPTIMIZE_LEVEL
 
 app = FastAPI()
 
 
 app = FastAPI()
+install_limits(app)
+install_metrics(app)
 
-DOCS = 'uploads'
-PDFS = 'output'
-os.makedirs(DOCS, exist_ok=True)
-os.makedirs(PDFS, exist_ok=True)
+# Uploads are streamed to disk in chunks of this size
+CHUNK_SIZE = 1024 * 1024
+# API keys that identify a client for fair queuing, comma-separated
+API_KEYS = {key.strip() for key in os.environ.get("API_KEYS", "").split(',') if key.strip()}
+# Addresses and networks of the proxies trusted to name the original caller
+# in X-Client-Address: the ingress and the frontend, comma-separated
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(network.strip())
+    for network in os.environ.get("TRUSTED_PROXIES", "127.0.0.0/8,::1/128").split(',') if network.strip()
+]
 
-Password_url = "http://password:8001/protect"
-merge_url = "http://merge:8002/merge"
+@app.exception_handler(Overloaded)
+@app.exception_handler(ScratchFull)
+@app.exception_handler(JobsFull)
+async def overloaded(request: Request, e: Exception):
+    # Tell clients and load balancers when to come back instead of queueing forever
+    return JSONResponse(
+        status_code=e.status_code,
+        content={'detail': str(e)},
+        headers={'Retry-After': str(e.retry_after)}
+    )
+
+def client_id(request: Request) -> str:
+    """
+    Identifies the caller for fair queuing: the X-API-Key header if it is one
+    of API_KEYS, otherwise the X-Client-Address header if the request comes
+    from one of TRUSTED_PROXIES, otherwise the connection's address.
+    """
+    api_key = request.headers.get('x-api-key')
+    if api_key in API_KEYS:
+        return f"key:{api_key}"
+    host = request.client.host if request.client else None
+    forwarded = request.headers.get('x-client-address')
+    if forwarded and host and trusted_proxy(host):
+        return forwarded.strip()
+    return host
+
+def trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+async def save_upload(file: UploadFile, path: str, limit: int = MAX_FILE_SIZE) -> int:
+    """
+    Streams an upload to path in chunks and returns its size.
+    Raises 413 as soon as the upload grows past limit.
+    """
+    size = 0
+    with open(path, 'wb') as f:
+        while chunk := await file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > limit:
+                f.close()
+                os.remove(path)
+                raise HTTPException(status_code=413, detail=f"File too large: {file.filename}")
+            await asyncio.to_thread(f.write, chunk)
+    return size
+
+@app.on_event("startup")
+async def start_pipeline():
+    open_http_client()
+
+@app.on_event("shutdown")
+async def stop_pipeline():
+    await close_http_client()
+
+@app.on_event("startup")
+async def start_scratch_sweeper():
+    scratch_space.start()
+
+@app.on_event("shutdown")
+async def stop_scratch_sweeper():
+    await scratch_space.stop()
+
+@app.on_event("startup")
+async def warm_conversion_pool():
+    # Warm the workers in the background so startup isn't delayed
+    asyncio.get_running_loop().run_in_executor(None, conversion_pool.warmup)
+
+@app.on_event("shutdown")
+async def stop_engines():
+    await asyncio.to_thread(ENGINES['libreoffice'].stop)
+
+def check_engine(engine: str):
+    """
+    Raises 400 unless engine is a known, installed conversion engine.
+    """
+    if engine is None:
+        return
+    if engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown engine: {engine}. Choose one of {', '.join(ENGINES)}.")
+    if not ENGINES[engine].available():
+        raise HTTPException(status_code=400, detail=f"Engine {engine} is not installed.")
+
+def check_optimize(level: int):
+    """
+    Raises 400 unless level is a size optimization level from 0 to 4.
+    """
+    if level is not None and not 0 <= level <= 4:
+        raise HTTPException(status_code=400, detail="Optimization level must be from 0 to 4.")
+
+def size_headers(sizes: tuple) -> dict:
+    # Report what optimization saved
+    if sizes is None:
+        return {}
+    return {'X-Size-Before': str(sizes[0]), 'X-Size-After': str(sizes[1])}
+
+@app.get("/engines")
+async def list_engines():
+    """
+    Endpoint to list the conversion engines, whether each is installed and the default.
+    """
+    return {
+        'default': DEFAULT_ENGINE,
+        'engines': {name: engine.available() for name, engine in ENGINES.items()},
+    }
+
+async def convert_document(input_path: str, output_path: str, engine: str = None, client: str = None):
+    """
+    Converts one document on the conversion pool, in parallel chunks if it is large.
+    - Documents over CHUNK_THRESHOLD are split at section and page breaks by
+      submit_chunked, the chunks are converted in parallel and stitched with
+      merge_files, and LaTeX output is numbered continuously with number_pages
+    - Anything else is converted in one piece with document_to_pdf
+    - Both go through the conversion cache, looked up and filled off the event
+      loop, and are queued as interactive work for client.
+    """
+    engine = select_engine(input_path, engine)
+    key = await asyncio.to_thread(cache_key, input_path, engine)
+    if await asyncio.to_thread(conversion_cache.get, key, output_path):
+        print(f"Cache hit: {input_path} -> {output_path}")
+        return
+    chunks = await asyncio.to_thread(submit_chunked, input_path, os.path.dirname(output_path), engine, client=client)
+    if not chunks:
+        await asyncio.wrap_future(conversion_pool.submit(document_to_pdf, input_path, output_path, engine, client=client))
+        await asyncio.to_thread(conversion_cache.put, key, output_path)
+        return
+
+    pdf_paths = [pdf_path for pdf_path, _ in chunks]
+    try:
+        await asyncio.gather(*[asyncio.wrap_future(future) for _, future in chunks])
+        await merge_files(pdf_paths, output_path, outlines=True)
+        if ENGINES[engine].latex:
+            with stage('number_pages'):
+                await asyncio.to_thread(number_pages, output_path, output_path)
+    except BaseException:
+        await asyncio.to_thread(cancel_bulk, chunks)
+        raise
+    finally:
+        for pdf_path in pdf_paths:
+            for path in (pdf_path, pdf_path[:-4] + '.docx'):
+                if os.path.exists(path):
+                    os.remove(path)
+    await asyncio.to_thread(conversion_cache.put, key, output_path)
 
 @app.post("/convert")
 async def upload_file(
+    request: Request,
     file: UploadFile = File(...),
-    password: str = Form(None)
+    password: str = Form(None),
+    engine: str = Form(None),
+    optimize: int = Form(None)
 ):
     """
     Endpoint to convert the uploaded document into the PDF format.
-     - Uses the document_to_pdf helper function
-        - Essential logic - pandoc wrapper with xelatex engine
+     - Uses the document_to_pdf helper function, or a cached PDF of the same document
+        - Essential logic - runs the conversion engine named by engine (see /engines),
+          CONVERT_ENGINE if not given; .doc files always use LibreOffice
            - Args:
                 - input_file (str): Path to the input .docx file.
                 - output_file (str): Path to the output .pdf file.
-     - If password is provided, protects the PDF using the protect_pdf helper function
-        - Essential logic - uses the PyPDF2 library
+        - Documents over CHUNK_THRESHOLD are converted in parallel chunks (see convert_document)
+     - If password is provided, protects the PDF using the protect_pdf helper function,
+       in process or through the password service depending on PIPELINE_MODE
+        - Essential logic - uses the pypdf library
            - Args:
                 - input_file (str): Path to the input .pdf file.
                 - output_file (str): Path to the output .pdf file with password protection.
                 - password (str): Password to protect the PDF file.
+    - If optimize (0-4, OPTIMIZE_LEVEL if not given) is set, shrinks the PDF with
+      optimize_file before protecting it and reports the sizes in X-Size-Before/X-Size-After
     - Returns the converted PDF file as a response.
+    - The upload and PDF live in a scratch directory removed once the response is sent.
     """
     if not file.filename.endswith(('.docx', '.doc')):
         raise HTTPException(status_code=400, detail="Invalid file format. Please upload a .docx or .doc file.")
-    input_filename = f"{uuid4()}_{file.filename}"
-    input_path = os.path.join(DOCS, input_filename)
+    check_engine('libreoffice' if file.filename.lower().endswith('.doc') else engine)
+    check_optimize(optimize)
+    if optimize is None:
+        optimize = OPTIMIZE_LEVEL
+    scratch = scratch_space.create()
+    input_filename = f"{uuid4()}_{os.path.basename(file.filename)}"
+    input_path = os.path.join(scratch, input_filename)
     output_filename = os.path.splitext(input_filename)[0] + '.pdf'
-    output_path = os.path.join(PDFS, output_filename)    
-    with open(input_path, 'wb') as f:
-        content = await file.read()
-        f.write(content)
+    output_path = os.path.join(scratch, output_filename)
     try:
-        document_to_pdf(input_path, output_path)
+        with stage('upload'):
+            await save_upload(file, input_path)
+        await convert_document(input_path, output_path, engine, client_id(request))
+
+        sizes = None
+        if optimize:
+            sizes = await optimize_file(output_path, optimize, output_path)
         
         if password:
-            with open(output_path, 'rb') as pdf_file:
-                files = {'file': (output_filename, pdf_file, 'application/pdf')}
-                data = {'password': password}
-                resp = requests.post(Password_url, files=files, data=data)
-                if resp.status_code == 200:
-                    # Replace output PDF with protected PDF
-                    with open(output_path, 'wb') as f:
-                        f.write(resp.content)
-                else:
-                    raise HTTPException(status_code=500, detail="Password protection failed.")
-        
-        return FileResponse(
-            path=output_path,
-            media_type='application/pdf',
-            filename=os.path.basename(output_path)
-        )
+            # Replace output PDF with protected PDF
+            await protect_file(output_path, password, output_path)
+    except (HTTPException, Overloaded):
+        scratch_space.remove(scratch)
+        raise
     except Exception as e:
+        scratch_space.remove(scratch)
         raise HTTPException(status_code=500, detail=f"Error during conversion: {str(e)}")
+
+    return FileResponse(
+        path=output_path,
+        media_type='application/pdf',
+        filename=os.path.basename(output_path),
+        headers=size_headers(sizes),
+        background=BackgroundTask(scratch_space.remove, scratch)
+    )
+
+async def process_bulk(input_files: list, output_folder: str, password: str = None, merge: bool = False, progress=None, engine: str = None, block: bool = False, optimize: int = 0, client: str = None):
+    """
+    Converts saved uploads and applies the bulk options.
+    - Converts every file with bulk_convert on the given engine, queued as batch
+      work for client; with block set, waits for room in the conversion queue
+      instead of raising QueueFull
+    - If merge is set, merges the plain PDFs with merge_files, optimizes the merged
+      PDF if optimize is set and, if password is provided, protects it once with protect_file
+    - Otherwise optimizes each PDF if optimize is set and zips them, protecting
+      them first with protect_files if password is provided
+    - Returns (path, media_type, filename) of the result, the intermediate PDFs and
+      the total sizes (before, after) of the optimized PDFs, or None.
+    """
+    converted_files = await asyncio.to_thread(bulk_convert, input_files, output_folder, progress, engine, block, client)
+    sizes = None
+
+    # Merging PDFs, then optimizing and encrypting the result once
+    if merge:
+        merged_filename = f"merged_{uuid4()}.pdf"
+        merged_path = os.path.join(output_folder, merged_filename)
+        await merge_files(converted_files, merged_path)
+        if optimize:
+            sizes = await optimize_file(merged_path, optimize, merged_path)
+        if password:
+            await protect_file(merged_path, password, merged_path)
+        return (merged_path, 'application/pdf', merged_filename), converted_files, sizes
+
+    if optimize:
+        results = await asyncio.gather(*[
+            optimize_file(pdf_path, optimize, pdf_path) for pdf_path in converted_files
+        ])
+        sizes = tuple(map(sum, zip(*results)))
+
+    # Password protection
+    if password:
+        protected_files = [pdf_path.replace('.pdf', '_protected.pdf') for pdf_path in converted_files]
+        await protect_files(converted_files, password, protected_files)
+        converted_files += protected_files
+        pdf_paths = protected_files
+    else:
+        pdf_paths = converted_files
+
+    # Create zip file only after all conversions are successful
+    zip_filename = f"converted_pdfs_{uuid4()}.zip"
+    zip_path = os.path.join(output_folder, zip_filename)
+    def write_zip():
+        with ZipFile(zip_path, 'w') as zipf:
+            for pdf_path in pdf_paths:
+                if os.path.exists(pdf_path):  # Check file exists before adding to zip
+                    zipf.write(pdf_path, arcname=os.path.basename(pdf_path))
+    with stage('zip'):
+        await asyncio.to_thread(write_zip)
+
+    if not os.path.exists(zip_path):
+        raise HTTPException(status_code=500, detail="Failed to create zip file")
+    return (zip_path, 'application/zip', zip_filename), converted_files, sizes
+
+async def stream_bulk_zip(jobs: list, scratch: str, password: str = None, optimize: int = 0):
+    """
+    Streams the PDFs of submitted conversions back as a zip.
+    - jobs are the (output_path, Future) pairs from submit_bulk, submitted before
+      the response starts so a full queue can still be reported as 429
+    - Each PDF is added to the zip as soon as its conversion (and optimization
+      and protection) finishes
+    - No archive is written to disk; the request's scratch directory is removed
+      once the stream ends, including when the client disconnects
+    """
+    async def finish(pdf_path, future):
+        await asyncio.wrap_future(future)
+        if optimize:
+            await optimize_file(pdf_path, optimize, pdf_path)
+        if password:
+            protected_path = pdf_path.replace('.pdf', '_protected.pdf')
+            await protect_file(pdf_path, password, protected_path)
+            return protected_path
+        return pdf_path
+
+    tasks = [asyncio.ensure_future(finish(*job)) for job in jobs]
+
+    async def entries():
+        for next_done in asyncio.as_completed(tasks):
+            pdf_path = await next_done
+            yield pdf_path, os.path.basename(pdf_path)
+
+    try:
+        async for chunk in stream_zip(entries()):
+            yield chunk
+    except Exception as e:
+        # The status line is already sent, so the client sees a truncated zip
+        print(f"Error in stream_bulk_zip: {str(e)}")
+        raise
     finally:
-        if os.path.exists(input_path):
-            os.remove(input_path)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Let running conversions finish before their directory goes away
+        await asyncio.to_thread(cancel_bulk, jobs)
+        await asyncio.to_thread(scratch_space.remove, scratch)
 
-@app.post("/bulk_convert")
-async def bulk_convert_endpoint(
-    files: List[UploadFile] = File(...),
-    password: str = Form(None),
-    merge: bool = Form(False)
-):
-    UPLOAD_FOLDER = '/app/uploads/conversion'
-    OUTPUT_FOLDER = '/app/output/conversion'
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+async def prepend(first: bytes, rest):
+    """
+    Yields first, then the rest of an async generator, closing it when done.
+    """
+    try:
+        yield first
+        async for chunk in rest:
+            yield chunk
+    finally:
+        await rest.aclose()
 
+async def save_uploads(files: List[UploadFile], upload_folder: str) -> list:
+    """
+    Validates and saves the uploaded documents, returning their input_files entries.
+    """
     input_files = []
-    converted_files = []
-    zip_path = None
-
+    total = 0
     try:
-        # Save uploaded files
         for file in files:
             if not file.filename.lower().endswith(('.docx', '.doc')):
                 raise HTTPException(status_code=400, detail=f"Invalid file format: {file.filename}")
             input_filename = f"{uuid4()}_{file.filename}"
-            input_path = os.path.join(UPLOAD_FOLDER, input_filename)
+            input_path = os.path.join(upload_folder, input_filename)
+            limit = min(MAX_FILE_SIZE, MAX_REQUEST_SIZE - total)
+            total += await save_upload(file, input_path, limit)
             input_files.append({'filename': file.filename, 'path': input_path})
-            with open(input_path, 'wb') as f:
-                f.write(await file.read())
+    except Exception:
+        for file in input_files:
+            if os.path.exists(file['path']):
+                os.remove(file['path'])
+        raise
+    return input_files
+
+@app.post("/bulk_convert")
+async def bulk_convert_endpoint(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    password: str = Form(None),
+    merge: bool = Form(False),
+    engine: str = Form(None),
+    optimize: int = Form(None)
+):
+    check_engine(engine)
+    check_optimize(optimize)
+    if optimize is None:
+        optimize = OPTIMIZE_LEVEL
+    # Uploads, PDFs and the result all live in the request's scratch directory
+    scratch = scratch_space.create()
+    response = None
 
-        # Convert files
-        converted_files = await asyncio.to_thread(bulk_convert, input_files, OUTPUT_FOLDER)
+    try:
+        # Save uploaded files
+        with stage('upload'):
+            input_files = await save_uploads(files, scratch)
 
-        # Password protection
-        if password:
-            protected_files = []
-            for pdf_path in converted_files:
-                with open(pdf_path, 'rb') as pdf_file:
-                    files_p = {'file': (os.path.basename(pdf_path), pdf_file, 'application/pdf')}
-                    data_p = {'password': password}
-                    resp_p = requests.post(Password_url, files=files_p, data=data_p)
-                    if resp_p.status_code == 200:
-                        protected_path = pdf_path.replace('.pdf', '_protected.pdf')
-                        with open(protected_path, 'wb') as f:
-                            f.write(resp_p.content)
-                        protected_files.append(protected_path)
-                    else:
-                        raise HTTPException(status_code=500, detail="Password protection failed.")
-            converted_files = protected_files
-
-        # Merging PDFs
-        if merge:
-            files_to_merge = []
-            for pdf_path in converted_files:
-                files_to_merge.append(
-                    ('files', (os.path.basename(pdf_path), open(pdf_path, 'rb'), 'application/pdf'))
-                )
-            resp_m = requests.post(merge_url, files=files_to_merge)
-            if resp_m.status_code == 200:
-                merged_filename = f"merged_{uuid4()}.pdf"
-                merged_path = os.path.join(OUTPUT_FOLDER, merged_filename)
-                # Save merged content to file
-                with open(merged_path, 'wb') as f:
-                    f.write(resp_m.content)
-                return FileResponse(
-                    path=merged_path,
-                    media_type='application/pdf',
-                    filename=merged_filename,
-                    background=None  # Prevent background task from deleting file too early
-                )
-            else:
-                raise HTTPException(status_code=500, detail="Merging failed.")
-        else:
-            # Create zip file only after all conversions are successful
+        if not merge:
+            # Stream the zip while the files convert; the stream cleans up after itself
+            jobs = submit_bulk(input_files, scratch, engine, client=client_id(request))
+            stream = stream_bulk_zip(jobs, scratch, password, optimize)
+            # Hold the status line until the first PDF is in the zip, so a batch
+            # whose first finished conversion fails still gets an error status
+            first = await stream.__anext__()
             zip_filename = f"converted_pdfs_{uuid4()}.zip"
-            zip_path = os.path.join(OUTPUT_FOLDER, zip_filename)
-            with ZipFile(zip_path, 'w') as zipf:
-                for pdf_path in converted_files:
-                    if os.path.exists(pdf_path):  # Check file exists before adding to zip
-                        zipf.write(pdf_path, arcname=os.path.basename(pdf_path))
-            
-            if not os.path.exists(zip_path):
-                raise HTTPException(status_code=500, detail="Failed to create zip file")
-                
-            return FileResponse(
-                path=zip_path,
+            response = StreamingResponse(
+                prepend(first, stream),
                 media_type='application/zip',
-                filename=zip_filename,
-                background=None  # Prevent background task from deleting file too early
+                headers={'Content-Disposition': f'attachment; filename="{zip_filename}"'}
             )
+            return response
+
+        (result_path, media_type, filename), _, sizes = await process_bulk(
+            input_files, scratch, password, merge, engine=engine, optimize=optimize,
+            client=client_id(request)
+        )
+        # Remove the scratch directory once the file has been sent
+        response = FileResponse(
+            path=result_path,
+            media_type=media_type,
+            filename=filename,
+            headers=size_headers(sizes),
+            background=BackgroundTask(scratch_space.remove, scratch)
+        )
+        return response
+    except (HTTPException, Overloaded):
+        raise
     except Exception as e:
         # Log the error details
         print(f"Error in bulk_convert_endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        # Delayed cleanup using background tasks
-        async def cleanup():
-            await asyncio.sleep(1)  # Give time for file to be sent
-            # Cleanup uploaded files
-            for file in input_files:
-                if os.path.exists(file['path']):
-                    os.remove(file['path'])
-            # Cleanup converted files
-            for pdf_path in converted_files:
-                if os.path.exists(pdf_path):
-                    os.remove(pdf_path)
-            # Cleanup zip file
-            if zip_path and os.path.exists(zip_path):
-                os.remove(zip_path)
-        
-        asyncio.create_task(cleanup())
\ No newline at end of file
+        if response is None:
+            scratch_space.remove(scratch)
+
+async def run_job(job):
+    """
+    Runs a submitted bulk conversion job from the job queue.
+    """
+    def progress():
+        job.completed += 1
+
+    (job.result_path, job.media_type, job.filename), converted_files, _ = await process_bulk(
+        job.input_files, job.directory, job.password, job.merge, progress, job.engine,
+        block=True, optimize=job.optimize, client=job.client
+    )
+    # Keep only the uploads' result on disk until the job expires
+    for path in [file['path'] for file in job.input_files] + converted_files:
+        if os.path.exists(path):
+            os.remove(path)
+    job.size = os.path.getsize(job.result_path)
+
+@app.on_event("startup")
+async def start_job_manager():
+    job_manager.start(run_job)
+
+@app.on_event("shutdown")
+async def stop_job_manager():
+    await job_manager.stop()
+
+@app.post("/jobs")
+async def submit_job(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    password: str = Form(None),
+    merge: bool = Form(False),
+    engine: str = Form(None),
+    optimize: int = Form(None)
+):
+    """
+    Endpoint to submit a bulk conversion as a background job.
+    - Takes the same form fields as /bulk_convert
+    - Answers 429 when MAX_PENDING_JOBS jobs are queued or running and 507 when
+      job files take JOBS_MAX_BYTES, both with a Retry-After header
+    - Returns the job ID right away; poll /jobs/{job_id} and download from /jobs/{job_id}/result
+    """
+    check_engine(engine)
+    check_optimize(optimize)
+    if optimize is None:
+        optimize = OPTIMIZE_LEVEL
+    job = job_manager.create(len(files), password, merge, engine, optimize, client_id(request))
+    try:
+        with stage('upload'):
+            job.input_files = await save_uploads(files, job.directory)
+        job.size = sum(os.path.getsize(file['path']) for file in job.input_files)
+    except Exception:
+        job_manager.remove(job)
+        raise
+    job_manager.submit(job)
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """
+    Endpoint to report the status and progress of a job.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """
+    Endpoint to download the result of a finished job. Can be called until the job expires.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    if job.status == 'failed':
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != 'done':
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}.")
+    return FileResponse(path=job.result_path, media_type=job.media_type, filename=job.filename)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Endpoint to report the conversion cache hit/miss counters and size.
+    """
+    return conversion_cache.stats()
\ No newline at end of file
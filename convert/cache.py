@@ -0,0 +1,123 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.environ.get("CACHE_DIR", "cache")
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 256 * 1024 * 1024))
+CACHE_TTL = int(os.environ.get("CACHE_TTL", 24 * 60 * 60))
+
+
+def cache_key(input_path: str, engine: str, options=()) -> str:
+    """
+    Returns the content address of a conversion.
+
+    Args:
+        input_path (str): Path to the input .docx file.
+        engine (str): PDF engine used for the conversion.
+        options (tuple): Extra pandoc options used for the conversion.
+    """
+    digest = hashlib.sha256()
+    with open(input_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    digest.update(b'\0' + engine.encode())
+    for option in options:
+        digest.update(b'\0' + str(option).encode())
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """
+    Size-bounded LRU cache of converted PDFs on local disk.
+
+    Entries older than ttl seconds are dropped on lookup, and the least
+    recently used entries are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES, ttl: int = CACHE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # Pick up entries left over by a previous run, oldest first
+        existing = []
+        for name in os.listdir(directory):
+            if name.endswith('.pdf'):
+                stat = os.stat(os.path.join(directory, name))
+                existing.append((stat.st_mtime, name[:-4], stat.st_size))
+        for stored_at, key, size in sorted(existing):
+            self._entries[key] = (size, stored_at)
+            self.size += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _remove(self, key: str):
+        size, _ = self._entries.pop(key)
+        self.size -= size
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+    def _evict(self):
+        while self._entries and self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def get(self, key: str, output_path: str) -> bool:
+        """
+        Copies the cached PDF for key to output_path.
+
+        Returns True on a hit, False on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            shutil.copyfile(self._path(key), output_path)
+            return True
+
+    def put(self, key: str, pdf_path: str):
+        """
+        Stores the PDF at pdf_path under key.
+        """
+        size = os.path.getsize(pdf_path)
+        if size > self.max_bytes:
+            return
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        shutil.copyfile(pdf_path, tmp_path)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            os.replace(tmp_path, self._path(key))
+            self._entries[key] = (size, time.time())
+            self.size += size
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+            }
+
+
+conversion_cache = ConversionCache()
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+import shutil
+import zipfile
+from uuid import uuid4
+from lxml import etree
+from pypdf import PdfReader, PdfWriter, PageObject
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+# Documents whose body (word/document.xml) is larger than this many bytes are
+# converted in parallel chunks; 0 turns chunking off
+CHUNK_THRESHOLD = int(os.environ.get("CHUNK_THRESHOLD", 1024 * 1024))
+# Smallest body size worth giving its own chunk
+CHUNK_MIN_BYTES = int(os.environ.get("CHUNK_MIN_BYTES", 256 * 1024))
+
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+DOCUMENT_XML = 'word/document.xml'
+
+# Page numbers stamped on stitched PDFs, placed where LaTeX's default plain
+# page style puts them: centered, on the footer baseline of the article class
+PAGE_NUMBER_FONT_SIZE = 10
+PAGE_NUMBER_HEIGHT = 0.11
+# Width of a digit in Times-Roman, in thousandths of the font size
+DIGIT_WIDTH = 500
+
+
+def document_size(input_path: str) -> int:
+    """
+    Returns the uncompressed size of a .docx file's body, or 0 if it isn't a .docx.
+    """
+    try:
+        with zipfile.ZipFile(input_path) as docx:
+            return docx.getinfo(DOCUMENT_XML).file_size
+    except (zipfile.BadZipFile, KeyError, OSError):
+        return 0
+
+
+def _breaks_after(element) -> bool:
+    # A section break, or a page break inside the paragraph
+    if element.tag != f'{{{W}}}p':
+        return False
+    if element.find(f'{{{W}}}pPr/{{{W}}}sectPr') is not None:
+        return True
+    return any(br.get(f'{{{W}}}type') == 'page' for br in element.iter(f'{{{W}}}br'))
+
+
+def _breaks_before(element) -> bool:
+    page_break = element.find(f'{{{W}}}pPr/{{{W}}}pageBreakBefore')
+    return page_break is not None and page_break.get(f'{{{W}}}val', 'true') not in ('0', 'false')
+
+
+def split_docx(input_path: str, output_folder: str, count: int) -> list:
+    """
+    Splits a .docx file into at most count documents of similar size.
+
+    The body is only cut where Word starts a new page anyway: after a section
+    break or a paragraph with a page break, or before a paragraph with "page
+    break before". Every chunk keeps the styles, numbering, media and
+    footnotes of the original and the final section properties.
+
+    Args:
+        input_path (str): Path to the input .docx file.
+        output_folder (str): Folder to write the chunks to.
+        count (int): Number of chunks wanted.
+
+    Returns a list of (chunk_path, footnotes) pairs in document order, where
+    footnotes is the number of footnote references in the chunks before it.
+    The list is empty if the document has fewer than two page boundaries to cut at.
+    """
+    with zipfile.ZipFile(input_path) as docx:
+        root = etree.fromstring(docx.read(DOCUMENT_XML))
+    body = root.find(f'{{{W}}}body')
+    children = list(body)
+    section = None
+    if children and children[-1].tag == f'{{{W}}}sectPr':
+        section = children.pop()
+
+    # Candidate cut positions: index of the first element of the next chunk
+    cuts = []
+    for index, element in enumerate(children[1:], 1):
+        if _breaks_after(children[index - 1]) or _breaks_before(element):
+            cuts.append(index)
+    if not cuts or count < 2:
+        return []
+
+    # Pick the cuts closest to equal shares of the body
+    sizes = [len(etree.tostring(element)) for element in children]
+    offsets = [0]
+    for size in sizes:
+        offsets.append(offsets[-1] + size)
+    total = offsets[-1]
+    chosen = []
+    for share in range(1, count):
+        target = total * share / count
+        cut = min(cuts, key=lambda c: abs(offsets[c] - target))
+        if (not chosen or cut > chosen[-1]) and cut < len(children):
+            chosen.append(cut)
+    if not chosen:
+        return []
+
+    chunks = []
+    footnotes = 0
+    bounds = [0] + chosen + [len(children)]
+    with zipfile.ZipFile(input_path) as docx:
+        for start, end in zip(bounds, bounds[1:]):
+            chunk_path = os.path.join(output_folder, f"{uuid4()}_chunk.docx")
+            body[:] = children[start:end] + ([section] if section is not None else [])
+            with zipfile.ZipFile(chunk_path, 'w', zipfile.ZIP_DEFLATED) as chunk:
+                for info in docx.infolist():
+                    # By name, since writing updates the ZipInfo it is given
+                    if info.filename == DOCUMENT_XML:
+                        chunk.writestr(info.filename, etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True))
+                    else:
+                        with docx.open(info) as src, chunk.open(info.filename, 'w') as dest:
+                            shutil.copyfileobj(src, dest)
+            chunks.append((chunk_path, footnotes))
+            footnotes += sum(
+                1 for element in children[start:end] for _ in element.iter(f'{{{W}}}footnoteReference')
+            )
+    return chunks
+
+
+def number_pages(pdf_path: str, output_path: str):
+    """
+    Stamps page numbers from 1 on every page of a PDF, centered in the footer.
+
+    Args:
+        pdf_path (str): Path to the input PDF file.
+        output_path (str): Path to write the numbered PDF to; may be pdf_path.
+    """
+    writer = PdfWriter(clone_from=PdfReader(pdf_path))
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Times-Roman'),
+    }))
+    for number, page in enumerate(writer.pages, 1):
+        box = page.mediabox
+        text = str(number)
+        x = (float(box.width) - PAGE_NUMBER_FONT_SIZE * DIGIT_WIDTH / 1000 * len(text)) / 2
+        y = float(box.height) * PAGE_NUMBER_HEIGHT
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /PageNumber {PAGE_NUMBER_FONT_SIZE} Tf {x:.2f} {y:.2f} Td ({text}) Tj ET".encode())
+        overlay = PageObject.create_blank_page(width=box.width, height=box.height)
+        overlay[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/PageNumber'): font}),
+        })
+        overlay[NameObject('/Contents')] = writer._add_object(stream)
+        page.merge_translated_page(overlay, float(box.left), float(box.bottom))
+    tmp_path = f"{output_path}.{uuid4()}.part"
+    try:
+        with open(tmp_path, 'wb') as f:
+            writer.write(f)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
\ No newline at end of file
@@ -1,36 +1,598 @@
 import subprocess
+import contextvars
+import math
 import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, FIRST_EXCEPTION, wait
 from uuid import uuid4
+from prometheus_client import Counter, Gauge, Histogram
+from cache import cache_key, conversion_cache
+from chunking import CHUNK_THRESHOLD, CHUNK_MIN_BYTES, document_size, split_docx
+from metrics import stage
+from cpu import cpu_quota
 
-def document_to_pdf(inputPath, outputPath):
+
+# Number of documents converted in parallel across /convert and /bulk_convert
+CONVERT_WORKERS = int(os.environ.get("CONVERT_WORKERS", 0)) or cpu_quota()
+# Jobs a worker runs before its scratch directory is recycled
+WORKER_MAX_JOBS = int(os.environ.get("WORKER_MAX_JOBS", 50))
+# Conversions that may wait for a worker in each priority class, and how
+# many of those one client may hold; requests beyond either get a 429
+MAX_QUEUE_DEPTH = int(os.environ.get("MAX_QUEUE_DEPTH", 20))
+CLIENT_MAX_QUEUE_DEPTH = int(os.environ.get("CLIENT_MAX_QUEUE_DEPTH", 0)) or max(1, MAX_QUEUE_DEPTH // 2)
+# Seconds a request's conversion may wait for a worker before it gets a 503
+MAX_QUEUE_WAIT = float(os.environ.get("MAX_QUEUE_WAIT", 60))
+# Conversions one client may run at once while other clients have conversions
+# waiting; by default all workers but one, so a newcomer gets a worker quickly
+CLIENT_MAX_CONVERSIONS = int(os.environ.get("CLIENT_MAX_CONVERSIONS", 0)) or max(1, CONVERT_WORKERS - 1)
+
+# Priority classes, highest first: single documents someone is waiting for,
+# then bulk requests and jobs
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+PRIORITIES = (INTERACTIVE, BATCH)
+
+QUEUE_DEPTH = Gauge('conversion_queue_depth', "Conversions waiting for a worker.")
+CONVERSIONS_RUNNING = Gauge('conversions_running', "Conversions currently running.")
+QUEUE_WAIT = Histogram(
+    'conversion_queue_wait_seconds', "Time conversions wait for a worker.", ['priority'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+REJECTIONS = Counter('conversion_rejections_total', "Conversions refused by admission control.", ['reason'])
+
+# Engine used when a request doesn't name one
+DEFAULT_ENGINE = os.environ.get("CONVERT_ENGINE", "xelatex")
+
+# LibreOffice listener settings
+SOFFICE = os.environ.get("SOFFICE", "soffice")
+# Python with the LibreOffice UNO bindings (python3-uno), used to run soffice_client.py
+UNO_PYTHON = os.environ.get("UNO_PYTHON", "/usr/bin/python3")
+LIBREOFFICE_PORT = int(os.environ.get("LIBREOFFICE_PORT", 2002))
+LIBREOFFICE_TIMEOUT = int(os.environ.get("LIBREOFFICE_TIMEOUT", 120))
+
+
+class PandocEngine:
+    """
+    Converts documents with pandoc and one of its PDF engines.
+
+    LaTeX engines (xelatex, tectonic) give the best math and typography;
+    HTML engines (wkhtmltopdf, weasyprint) are much faster on plain documents.
+    """
+
+    def __init__(self, pdf_engine: str):
+        self.name = pdf_engine
+        # LaTeX engines number pages themselves
+        self.latex = pdf_engine in ('xelatex', 'tectonic')
+
+    def available(self) -> bool:
+        return bool(shutil.which('pandoc') and shutil.which(self.name))
+
+    def convert(self, inputPath, outputPath, env=None, options=()):
+        command = ["pandoc", inputPath, "-o", outputPath, f"--pdf-engine={self.name}", *options]
+        subprocess.run(command, check=True, env=env)
+
+    def warmup(self, tmpdir):
+        source = os.path.join(tmpdir, 'warmup.md')
+        with open(source, 'w') as f:
+            f.write('Warm up\n')
+        self.convert(source, os.path.join(tmpdir, 'warmup.pdf'), env=dict(os.environ, TMPDIR=tmpdir))
+
+
+class LibreOfficeEngine:
+    """
+    Converts documents with a headless LibreOffice kept running as a UNO listener.
+
+    The listener is started on first use and restarted if it exits, so each
+    conversion skips LibreOffice's multi-second startup. soffice_client.py
+    connects to it and exports the document with the Writer PDF filter.
+    LibreOffice reads .doc as well as .docx. One listener converts one
+    document at a time, so conversions on this engine are serialized.
+    """
+
+    name = 'libreoffice'
+    latex = False
+
+    def __init__(self, port: int = LIBREOFFICE_PORT, timeout: int = LIBREOFFICE_TIMEOUT):
+        self.port = port
+        self.timeout = timeout
+        self._process = None
+        self._profile = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return bool(shutil.which(SOFFICE) and os.path.exists(UNO_PYTHON))
+
+    def _ensure_listener(self):
+        if self._process is not None and self._process.poll() is None:
+            return
+        if self._process is not None:
+            print(f"LibreOffice listener exited with {self._process.returncode}, restarting")
+        if self._profile is None:
+            self._profile = tempfile.mkdtemp(prefix='libreoffice-profile-')
+        self._process = subprocess.Popen([
+            SOFFICE, '--headless', '--invisible', '--nologo', '--norestore', '--nodefault', '--nolockcheck',
+            f'-env:UserInstallation=file://{self._profile}',
+            f'--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext',
+        ])
+
+    def convert(self, inputPath, outputPath, env=None, options=()):
+        client = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'soffice_client.py')
+        with self._lock:
+            self._ensure_listener()
+            try:
+                subprocess.run(
+                    [UNO_PYTHON, client, str(self.port), inputPath, outputPath],
+                    check=True, timeout=self.timeout
+                )
+            except subprocess.TimeoutExpired:
+                # A hung listener would block every later conversion
+                self.stop()
+                raise
+
+    def warmup(self, tmpdir):
+        with self._lock:
+            self._ensure_listener()
+
+    def stop(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+
+ENGINES = {
+    'xelatex': PandocEngine('xelatex'),
+    'tectonic': PandocEngine('tectonic'),
+    'wkhtmltopdf': PandocEngine('wkhtmltopdf'),
+    'weasyprint': PandocEngine('weasyprint'),
+    'libreoffice': LibreOfficeEngine(),
+}
+
+
+def select_engine(inputPath, engine=None) -> str:
+    """
+    Returns the engine name to convert inputPath with.
+
+    pandoc cannot read .doc files, so those always go to LibreOffice.
+    Raises ValueError for an unknown engine.
+    """
+    engine = engine or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown conversion engine: {engine}. Choose one of {', '.join(ENGINES)}.")
+    if inputPath.lower().endswith('.doc'):
+        return 'libreoffice'
+    return engine
+
+
+def document_to_pdf(inputPath, outputPath, engine=None, tmpdir=None, options=()):
     """
-    Converts a .docx file to a .pdf file using Pandoc with a specific LaTeX engine.
+    Converts a .docx or .doc file to a .pdf file with the selected engine.
 
     Args:
-        input_file (str): Path to the input .docx file.
+        input_file (str): Path to the input .docx or .doc file.
         output_file (str): Path to the output .pdf file.
+        engine (str): Name of an engine in ENGINES, DEFAULT_ENGINE if not given.
+        tmpdir (str): Directory the engine uses for intermediate files.
+        options (tuple): Extra pandoc options.
     """
+    engine = select_engine(inputPath, engine)
+    env = None
+    if tmpdir:
+        env = dict(os.environ, TMPDIR=tmpdir)
     try:
-        command = ["pandoc", inputPath, "-o", outputPath, "--pdf-engine=xelatex"]
-        subprocess.run(command, check=True)
-        print(f"Conversion successful: {inputPath} -> {outputPath}")
+        # Timed per engine, e.g. convert_xelatex, to compare them on real documents
+        with stage(f'convert_{engine}'):
+            ENGINES[engine].convert(inputPath, outputPath, env=env, options=options)
+        print(f"Conversion successful ({engine}): {inputPath} -> {outputPath}")
     except subprocess.CalledProcessError as e:
         print(f"Error during conversion: {e}")
         raise e
-    
-def bulk_convert(input_files: list, output_folder: str):
-    """'
-    Converts multiple .docx files to .pdf files using Pandoc with a specific LaTeX engine.
-    
+
+class Overloaded(Exception):
+    """
+    Raised when the conversion pool cannot take more work.
+    status_code and retry_after become the response status and Retry-After header.
+    """
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFull(Overloaded):
+    status_code = 429
+
+
+class QueueTimeout(Overloaded):
+    status_code = 503
+
+
+class ConversionPool:
+    """
+    Long-lived pool of conversion workers shared by /convert and /bulk_convert.
+
+    pandoc and xelatex are separate programs and are started per document, so
+    the pool keeps everything around them warm instead: each worker owns a
+    scratch directory for intermediate files, and warmup() runs one small
+    conversion per worker so the fonts and xelatex format files are in the
+    page cache before the first request. A worker's scratch directory is
+    wiped and recreated after max_jobs conversions.
+
+    Waiting conversions are queued per priority class and client. A free
+    worker takes the next conversion from the highest class with work,
+    going round-robin over that class's clients and passing over clients
+    that already run client_max conversions while others have work waiting,
+    so one client's batch can neither hold up single documents nor shut
+    other clients out, yet still gets every worker when it is alone.
+
+    At most workers conversions run at once and at most max_queue wait for a
+    worker in each class, of which one client may hold client_queue, so a
+    client that filled its share can't turn the others away. Submissions that don't fit raise QueueFull
+    right away instead of queueing without bound, and a submission whose
+    first conversion waited longer than max_wait fails with QueueTimeout
+    instead of starting, since its client has likely given up. Once one of
+    its conversions has started, the rest of the submission may wait as long
+    as the ones before it take.
+    """
+
+    def __init__(self, workers: int = CONVERT_WORKERS, max_jobs: int = WORKER_MAX_JOBS,
+                 max_queue: int = MAX_QUEUE_DEPTH, max_wait: float = MAX_QUEUE_WAIT,
+                 client_max: int = CLIENT_MAX_CONVERSIONS, client_queue: int = CLIENT_MAX_QUEUE_DEPTH):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.client_max = client_max
+        self.client_queue = client_queue
+        self._local = threading.local()
+        self._slots = threading.Condition()
+        # priority -> client -> queued conversions, clients in round-robin order
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._waiting = dict.fromkeys(PRIORITIES, 0)
+        self._running = 0
+        self._client_running = {}
+        # Moving average of conversion time, used to estimate Retry-After
+        self._average = 10.0
+        self._threads = []
+
+    def _scratch(self) -> str:
+        local = self._local
+        if getattr(local, 'jobs', 0) >= self.max_jobs:
+            shutil.rmtree(local.tmpdir, ignore_errors=True)
+            del local.tmpdir
+        if not hasattr(local, 'tmpdir'):
+            local.tmpdir = tempfile.mkdtemp(prefix='convert-worker-')
+            local.jobs = 0
+        local.jobs += 1
+        return local.tmpdir
+
+    def retry_after(self) -> int:
+        """
+        Returns the estimated seconds until the queue has drained.
+        """
+        backlog = sum(self._waiting.values()) + self._running
+        return max(1, math.ceil(backlog / self.workers * self._average))
+
+    def _start(self):
+        # Workers are started on first use, so importing this module stays cheap
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f'convert_{len(self._threads)}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _admit(self, count: int, block: bool, priority: str, client):
+        # Called with _slots held. A batch larger than the queue or the
+        # client's share is admitted once nothing waits in the class.
+        while True:
+            waiting = self._waiting[priority]
+            client_waiting = len(self._queues[priority].get(client, ()))
+            if not waiting or (waiting + count <= self.max_queue and client_waiting + count <= self.client_queue):
+                return
+            if not block:
+                REJECTIONS.labels('queue_full').inc(count)
+                raise QueueFull("Conversion queue is full, try again later.", self.retry_after())
+            self._slots.wait()
+
+    def _take(self, priority: str, client, entry=None):
+        # Removes entry, or the client's oldest conversion, from the queue
+        clients = self._queues[priority]
+        queue = clients[client]
+        if entry is None:
+            entry = queue.popleft()
+            clients.move_to_end(client)
+        else:
+            queue.remove(entry)
+        if not queue:
+            del clients[client]
+        self._waiting[priority] -= 1
+        QUEUE_DEPTH.set(sum(self._waiting.values()))
+        self._slots.notify_all()
+        return entry
+
+    def _next(self):
+        # Called with _slots held. Returns the next conversion a worker may
+        # start, or None. Clients at their cap only get a worker no one else
+        # has work for.
+        for capped in (True, False):
+            for priority in PRIORITIES:
+                for client in list(self._queues[priority]):
+                    if capped and client is not None and self._client_running.get(client, 0) >= self.client_max:
+                        continue
+                    entry = self._take(priority, client)
+                    if not entry[0].set_running_or_notify_cancel():
+                        # Cancelled, but _cancelled hasn't got the lock yet
+                        return self._next()
+                    self._running += 1
+                    self._client_running[client] = self._client_running.get(client, 0) + 1
+                    CONVERSIONS_RUNNING.set(self._running)
+                    return entry
+        return None
+
+    def _cancelled(self, future):
+        # Cancelled before a worker picked it up: free its place in the queue
+        if not future.cancelled():
+            return
+        with self._slots:
+            for priority, clients in self._queues.items():
+                for client, queue in clients.items():
+                    for entry in queue:
+                        if entry[0] is future:
+                            self._take(priority, client, entry)
+                            return
+
+    def _release(self, client, duration: float = None):
+        with self._slots:
+            self._running -= 1
+            self._client_running[client] -= 1
+            if not self._client_running[client]:
+                del self._client_running[client]
+            if duration is not None:
+                self._average = 0.8 * self._average + 0.2 * duration
+            CONVERSIONS_RUNNING.set(self._running)
+            # A worker may have skipped this client's queue while it was at its cap
+            self._slots.notify_all()
+
+    def _worker(self):
+        while True:
+            with self._slots:
+                entry = self._next()
+                while entry is None:
+                    self._slots.wait()
+                    entry = self._next()
+            future, context = entry[0], entry[-1]
+            try:
+                future.set_result(context.run(self._run, *entry[1:-1]))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _run(self, queued, batch, priority, client, func, *args):
+        waited = time.monotonic() - queued
+        QUEUE_WAIT.labels(priority).observe(waited)
+        if batch['max_wait'] is not None and waited > batch['max_wait']:
+            self._release(client)
+            REJECTIONS.labels('queue_timeout').inc()
+            raise QueueTimeout("Conversion waited too long for a worker, try again later.", self.retry_after())
+        # The request is being served: later conversions of the batch wait
+        # for this one, not for a free worker
+        batch['max_wait'] = None
+        start = time.monotonic()
+        try:
+            return func(*args, tmpdir=self._scratch())
+        finally:
+            self._release(client, time.monotonic() - start)
+
+    def submit_many(self, calls: list, block: bool = False, priority: str = INTERACTIVE, client: str = None) -> list:
+        """
+        Schedules func(*args, tmpdir=...) on a worker for each (func, args) in
+        calls and returns their Futures. The calls are admitted together:
+        if they don't fit in client's share of the queue of their priority
+        class, QueueFull is raised and nothing is scheduled, or with block
+        set, this waits for room and the calls are exempt from max_wait.
+        Otherwise max_wait only applies until the first of the calls starts.
+        client identifies the caller for fair queuing and the per-client cap;
+        None is exempt from the cap. The caller's context is carried over so
+        stage timings reach its request.
+        """
+        batch = {'max_wait': None if block else self.max_wait}
+        futures = []
+        with self._slots:
+            self._start()
+            self._admit(len(calls), block, priority, client)
+            queue = self._queues[priority].setdefault(client, deque())
+            for func, args in calls:
+                future = Future()
+                future.add_done_callback(self._cancelled)
+                queue.append((future, time.monotonic(), batch, priority, client, func, *args, contextvars.copy_context()))
+                futures.append(future)
+            self._waiting[priority] += len(calls)
+            QUEUE_DEPTH.set(sum(self._waiting.values()))
+            self._slots.notify_all()
+        return futures
+
+    def submit(self, func, *args, block: bool = False, priority: str = INTERACTIVE, client: str = None):
+        """
+        Schedules func(*args, tmpdir=...) on a worker and returns its Future.
+        """
+        return self.submit_many([(func, args)], block, priority, client)[0]
+
+    def warmup(self, engine: str = DEFAULT_ENGINE):
+        """
+        Runs one small conversion per worker, or starts the listener of a
+        persistent engine.
+        """
+        if not ENGINES[engine].available():
+            print(f"Conversion engine {engine} is not installed, skipping warm up")
+            return
+
+        def warm(tmpdir=None):
+            ENGINES[engine].warmup(tmpdir)
+
+        futures = self.submit_many([(warm, ())] * self.workers, block=True)
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Warm up failed: {e}")
+
+
+conversion_pool = ConversionPool()
+
+
+def cached_document_to_pdf(inputPath, outputPath, engine=None, tmpdir=None):
+    """
+    Converts a .docx or .doc file to a .pdf file, reusing an earlier conversion
+    of the same document with the same engine.
+
+    Args:
+        input_file (str): Path to the input .docx or .doc file.
+        output_file (str): Path to the output .pdf file.
+        engine (str): Name of an engine in ENGINES, DEFAULT_ENGINE if not given.
+        tmpdir (str): Directory the engine uses for intermediate files.
+    """
+    engine = select_engine(inputPath, engine)
+    key = cache_key(inputPath, engine)
+    if conversion_cache.get(key, outputPath):
+        print(f"Cache hit: {inputPath} -> {outputPath}")
+        return
+    document_to_pdf(inputPath, outputPath, engine, tmpdir=tmpdir)
+    conversion_cache.put(key, outputPath)
+
+def submit_bulk(input_files: list, output_folder: str, engine: str = None, block: bool = False, client: str = None) -> list:
+    """
+    Schedules the conversion of multiple .docx files on the shared conversion
+    pool, in the batch priority class.
+
     Args:
         input_files (List[Dict]): List of dictionaries containing the path to the input .docx files.
         output_folder (str): Path to the output folder where the converted .pdf files will be saved.
+        engine (str): Name of an engine in ENGINES, DEFAULT_ENGINE if not given.
+        block (bool): Wait for room in the conversion queue instead of raising QueueFull.
+        client (str): Client the conversions are queued for (see ConversionPool).
+
+    Returns a list of (output_path, Future) pairs in the order of input_files.
     """
-    converted_files = []
+    calls = []
     for file in input_files:
         input_path = file['path']
-        output_filename = f"{uuid4()}_{input_path.split('/')[-1].replace('.docx', '.pdf')}"
+        output_filename = f"{uuid4()}_{os.path.splitext(input_path.split('/')[-1])[0]}.pdf"
         output_path = f"{output_folder}/{output_filename}"
-        document_to_pdf(input_path, output_path)
-        converted_files.append(output_path)
-    return converted_files
\ No newline at end of file
+        calls.append((cached_document_to_pdf, (input_path, output_path, engine)))
+    futures = conversion_pool.submit_many(calls, block, BATCH, client)
+    return [(args[1], future) for (_, args), future in zip(calls, futures)]
+
+def convert_chunk(inputPath, outputPath, engine, footnotes, tmpdir=None):
+    """
+    Converts one chunk from split_docx to a .pdf file.
+
+    LaTeX engines leave the pages unnumbered, since the stitched PDF is
+    numbered as a whole, and continue the footnote numbering of the chunks
+    before it.
+
+    Args:
+        input_file (str): Path to the chunk .docx file.
+        output_file (str): Path to the output .pdf file.
+        engine (str): Name of a pandoc engine in ENGINES.
+        footnotes (int): Number of footnotes in the chunks before this one.
+        tmpdir (str): Directory the engine uses for intermediate files.
+    """
+    options = ()
+    if ENGINES[engine].latex:
+        header = os.path.join(tmpdir or os.path.dirname(outputPath), f"{uuid4()}_header.tex")
+        with open(header, 'w') as f:
+            f.write(f"\\AtBeginDocument{{\\setcounter{{footnote}}{{{footnotes}}}}}\n")
+        options = ("-V", "pagestyle=empty", f"--include-in-header={header}")
+    try:
+        document_to_pdf(inputPath, outputPath, engine, tmpdir=tmpdir, options=options)
+    finally:
+        if options:
+            os.remove(header)
+
+def submit_chunked(inputPath, output_folder: str, engine: str = None, block: bool = False, client: str = None) -> list:
+    """
+    Splits a large .docx file and schedules its chunks on the shared conversion pool.
+
+    Only documents whose body is over CHUNK_THRESHOLD bytes are split, into
+    at most one chunk per worker and CHUNK_MIN_BYTES, at section and page
+    breaks (see split_docx). LibreOffice converts one document at a time, so
+    its documents are never split.
+
+    Args:
+        input_file (str): Path to the input .docx file.
+        output_folder (str): Folder for the chunks and their .pdf files.
+        engine (str): Name of an engine in ENGINES, DEFAULT_ENGINE if not given.
+        block (bool): Wait for room in the conversion queue instead of raising QueueFull.
+        client (str): Client the chunks are queued for (see ConversionPool).
+
+    Returns a list of (output_path, Future) pairs in document order, or an
+    empty list if the document should be converted in one piece.
+    """
+    engine = select_engine(inputPath, engine)
+    if not CHUNK_THRESHOLD or not isinstance(ENGINES[engine], PandocEngine):
+        return []
+    size = document_size(inputPath)
+    if size <= CHUNK_THRESHOLD:
+        return []
+    count = min(conversion_pool.workers, size // CHUNK_MIN_BYTES)
+    chunks = split_docx(inputPath, output_folder, count)
+    if not chunks:
+        return []
+    calls = [
+        (convert_chunk, (chunk_path, f"{chunk_path[:-5]}.pdf", engine, footnotes))
+        for chunk_path, footnotes in chunks
+    ]
+    try:
+        futures = conversion_pool.submit_many(calls, block, INTERACTIVE, client)
+    except Overloaded:
+        for chunk_path, _ in chunks:
+            os.remove(chunk_path)
+        raise
+    print(f"Converting {inputPath} in {len(chunks)} chunks")
+    return [(args[1], future) for (_, args), future in zip(calls, futures)]
+
+def cancel_bulk(jobs: list):
+    """
+    Cancels the conversions of a bulk batch that have not started, waits for
+    the running ones and removes every output of the batch.
+    """
+    for _, future in jobs:
+        future.cancel()
+    wait([future for _, future in jobs])
+    for output_path, _ in jobs:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+def bulk_convert(input_files: list, output_folder: str, progress=None, engine: str = None, block: bool = False, client: str = None):
+    """'
+    Converts multiple .docx files to .pdf files with the selected conversion engine.
+
+    Files are converted in parallel on the shared conversion pool. The returned
+    paths keep the order of input_files. If any conversion fails, the
+    conversions that have not started yet are cancelled and the error is raised.
+    
+    Args:
+        input_files (List[Dict]): List of dictionaries containing the path to the input .docx files.
+        output_folder (str): Path to the output folder where the converted .pdf files will be saved.
+        progress (Callable): Called with no arguments each time a file finishes converting.
+        engine (str): Name of an engine in ENGINES, DEFAULT_ENGINE if not given.
+        block (bool): Wait for room in the conversion queue instead of raising QueueFull.
+        client (str): Client the conversions are queued for (see ConversionPool).
+    """
+    jobs = submit_bulk(input_files, output_folder, engine, block, client)
+    futures = [future for _, future in jobs]
+    if progress:
+        for future in futures:
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() or progress())
+    done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+    for future in done:
+        if future.exception() is not None:
+            cancel_bulk(jobs)
+            raise future.exception()
+    return [output_path for output_path, _ in jobs]
\ No newline at end of file
@@ -0,0 +1,192 @@
+import asyncio
+import os
+import shutil
+import time
+from collections import OrderedDict, deque
+from uuid import uuid4
+
+JOBS_DIR = os.environ.get("JOBS_DIR", "/app/jobs")
+JOB_TTL = int(os.environ.get("JOB_TTL", 60 * 60))
+# Jobs run at once; their conversions share the conversion pool fairly
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# Jobs that may be queued or running at once, and the disk space all jobs'
+# uploads and results may take; /jobs refuses new jobs beyond either
+MAX_PENDING_JOBS = int(os.environ.get("MAX_PENDING_JOBS", 20))
+JOBS_MAX_BYTES = int(os.environ.get("JOBS_MAX_BYTES", 1024 * 1024 * 1024))
+# Retry-After for a full job queue, in seconds
+JOBS_RETRY_AFTER = int(os.environ.get("JOBS_RETRY_AFTER", 30))
+
+
+class JobsFull(Exception):
+    """
+    Raised when a new job would exceed the pending job or disk space limit.
+    status_code and retry_after become the response status and Retry-After header.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Job:
+    """
+    A bulk conversion submitted through the job API.
+
+    Inputs and the result live in the job's own directory, which is
+    removed when the job expires.
+    """
+
+    def __init__(self, directory: str, total: int, password: str = None, merge: bool = False, engine: str = None, optimize: int = 0, client: str = None):
+        self.id = str(uuid4())
+        self.directory = os.path.join(directory, self.id)
+        self.total = total
+        self.password = password
+        self.merge = merge
+        self.engine = engine
+        self.optimize = optimize
+        self.client = client
+        self.status = 'queued'
+        self.completed = 0
+        self.error = None
+        self.input_files = []
+        self.result_path = None
+        self.media_type = None
+        self.filename = None
+        # Bytes the job's directory takes, set once its uploads or result are saved
+        self.size = 0
+        self.created = time.time()
+        self.finished = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'completed': self.completed,
+            'total': self.total,
+            'error': self.error,
+            'expires_at': self.finished + JOB_TTL if self.finished else None,
+        }
+
+
+class JobManager:
+    """
+    Background queue of bulk conversion jobs.
+
+    Jobs are picked up by JOB_WORKERS tasks running handler(job). Queued jobs
+    are taken round-robin by client, clients without a running job first, so
+    one client's jobs don't hold up everyone else's. Finished jobs keep
+    their result on disk for ttl seconds so the download can be retried
+    without converting again. At most max_pending jobs are queued or running
+    and all jobs take at most max_bytes on disk; create() raises JobsFull
+    beyond that.
+    """
+
+    def __init__(self, directory: str = JOBS_DIR, ttl: int = JOB_TTL, workers: int = JOB_WORKERS,
+                 max_pending: int = MAX_PENDING_JOBS, max_bytes: int = JOBS_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.jobs = {}
+        # client -> queued jobs, clients in round-robin order
+        self._queues = OrderedDict()
+        self._queued = None
+        self._running = {}
+        self._tasks = []
+
+    def start(self, handler):
+        """
+        Starts the worker tasks on the running event loop.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._queued = asyncio.Semaphore(0)
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(handler)))
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def admit(self):
+        """
+        Raises JobsFull unless there is room for another job.
+        """
+        self.sweep()
+        pending = sum(1 for job in self.jobs.values() if job.finished is None)
+        if pending >= self.max_pending:
+            raise JobsFull("Too many jobs are waiting, try again later.", 429, JOBS_RETRY_AFTER)
+        if sum(job.size for job in self.jobs.values()) >= self.max_bytes:
+            # Space comes back as finished jobs expire
+            expiries = [job.finished + self.ttl - time.time() for job in self.jobs.values() if job.finished]
+            retry_after = max(1, int(min(expiries))) if expiries else JOBS_RETRY_AFTER
+            raise JobsFull("Not enough space for job files, try again later.", 507, retry_after)
+
+    def create(self, total: int, password: str = None, merge: bool = False, engine: str = None, optimize: int = 0, client: str = None) -> Job:
+        self.admit()
+        job = Job(self.directory, total, password, merge, engine, optimize, client)
+        self.jobs[job.id] = job
+        return job
+
+    def submit(self, job: Job):
+        self._queues.setdefault(job.client, deque()).append(job)
+        self._queued.release()
+
+    def _next(self) -> Job:
+        # Stable, so clients keep their round-robin order within each group
+        client = sorted(self._queues, key=lambda c: c in self._running)[0]
+        queue = self._queues[client]
+        job = queue.popleft()
+        self._queues.move_to_end(client)
+        if not queue:
+            del self._queues[client]
+        return job
+
+    def get(self, job_id: str) -> Job:
+        self.sweep()
+        return self.jobs.get(job_id)
+
+    def remove(self, job: Job):
+        self.jobs.pop(job.id, None)
+        shutil.rmtree(job.directory, ignore_errors=True)
+
+    def sweep(self):
+        """
+        Removes jobs whose results have expired.
+        """
+        now = time.time()
+        for job in list(self.jobs.values()):
+            if job.finished and now - job.finished > self.ttl:
+                self.remove(job)
+
+    async def _worker(self, handler):
+        while True:
+            await self._queued.acquire()
+            job = self._next()
+            self._running[job.client] = self._running.get(job.client, 0) + 1
+            job.status = 'running'
+            try:
+                await handler(job)
+                job.status = 'done'
+            except Exception as e:
+                print(f"Error in job {job.id}: {str(e)}")
+                job.status = 'failed'
+                job.error = getattr(e, 'detail', str(e))
+            finally:
+                job.finished = time.time()
+                self._running[job.client] -= 1
+                if not self._running[job.client]:
+                    del self._running[job.client]
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(60)
+            self.sweep()
+
+
+job_manager = JobManager()
\ No newline at end of file
@@ -0,0 +1,239 @@
+import asyncio
+import os
+import shutil
+from uuid import uuid4
+from zipfile import ZipFile
+import httpx
+from fastapi import HTTPException
+from metrics import stage
+
+# Protect, merge and optimize run in this process ("local") or through the
+# password and merge services ("remote"). Local mode needs merge.py,
+# optimize.py and password.py from the merge and protect services next to
+# this module.
+try:
+    from merge import merge_pdfs
+    from optimize import optimize_pdf
+    from password import protect_pdf
+except ImportError:
+    merge_pdfs = optimize_pdf = protect_pdf = None
+
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "local")
+if PIPELINE_MODE == "local" and (merge_pdfs is None or optimize_pdf is None or protect_pdf is None):
+    print("merge.py/optimize.py/password.py not found, using the password and merge services")
+    PIPELINE_MODE = "remote"
+
+# Size optimization level applied to converted PDFs when a request doesn't
+# give one, from 0 (off) to 4 (see optimize_pdf)
+OPTIMIZE_LEVEL = int(os.environ.get("OPTIMIZE_LEVEL", 0))
+
+Password_url = "http://password:8001/protect"
+Password_batch_url = "http://password:8001/protect/batch"
+merge_url = "http://merge:8002/merge"
+optimize_url = "http://merge:8002/optimize"
+
+CHUNK_SIZE = 1024 * 1024
+
+# Pooled keep-alive client for the password and merge services
+SERVICE_TIMEOUT = float(os.environ.get("SERVICE_TIMEOUT", 300))
+SERVICE_CONNECTIONS = int(os.environ.get("SERVICE_CONNECTIONS", 20))
+http_client: httpx.AsyncClient = None
+
+
+def open_http_client():
+    global http_client
+    http_client = httpx.AsyncClient(
+        timeout=SERVICE_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=SERVICE_CONNECTIONS,
+            max_keepalive_connections=SERVICE_CONNECTIONS
+        )
+    )
+
+
+async def close_http_client():
+    await http_client.aclose()
+
+
+def part_path(output_path: str) -> str:
+    # Write to a temporary name so output_path can also be one of the inputs
+    return f"{output_path}.{uuid4()}.part"
+
+
+async def post_to_file(url: str, output_path: str, error: str, **kwargs):
+    """
+    POSTs file-backed multipart data and streams the response body to output_path.
+    Uploads are read from the open files in chunks rather than loaded into memory.
+    """
+    tmp_path = part_path(output_path)
+    try:
+        async with http_client.stream('POST', url, **kwargs) as resp:
+            if resp.status_code != 200:
+                raise HTTPException(status_code=500, detail=error)
+            with open(tmp_path, 'wb') as f:
+                async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                    await asyncio.to_thread(f.write, chunk)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+async def protect_remote(pdf_path: str, password: str, output_path: str):
+    """
+    Protects a PDF through the password service and saves the result to output_path.
+    """
+    with open(pdf_path, 'rb') as pdf_file:
+        files = {'file': (os.path.basename(pdf_path), pdf_file, 'application/pdf')}
+        await post_to_file(Password_url, output_path, "Password protection failed.", files=files, data={'password': password})
+
+
+async def protect_batch_remote(pdf_paths: list, password: str, output_paths: list):
+    """
+    Protects many PDFs in one request to the password service's batch endpoint
+    and saves the results to output_paths.
+    """
+    zip_path = part_path(output_paths[0]) + '.zip'
+    pdf_files = [open(pdf_path, 'rb') for pdf_path in pdf_paths]
+    try:
+        files = [
+            ('files', (os.path.basename(pdf_path), pdf_file, 'application/pdf'))
+            for pdf_path, pdf_file in zip(pdf_paths, pdf_files)
+        ]
+        await post_to_file(Password_batch_url, zip_path, "Password protection failed.", files=files, data={'password': password})
+
+        def extract():
+            # Entries come back in upload order
+            with ZipFile(zip_path) as zipf:
+                for info, output_path in zip(zipf.infolist(), output_paths):
+                    with zipf.open(info) as src, open(output_path, 'wb') as dest:
+                        shutil.copyfileobj(src, dest)
+        await asyncio.to_thread(extract)
+    finally:
+        for pdf_file in pdf_files:
+            pdf_file.close()
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+
+
+async def merge_remote(pdf_paths: list, output_path: str, outlines: bool = False):
+    """
+    Merges PDFs through the merge service and saves the result to output_path.
+    """
+    pdf_files = [open(pdf_path, 'rb') for pdf_path in pdf_paths]
+    try:
+        files = [
+            ('files', (os.path.basename(pdf_path), pdf_file, 'application/pdf'))
+            for pdf_path, pdf_file in zip(pdf_paths, pdf_files)
+        ]
+        data = {'outlines': 'true'} if outlines else None
+        await post_to_file(merge_url, output_path, "Merging failed.", files=files, data=data)
+    finally:
+        for pdf_file in pdf_files:
+            pdf_file.close()
+
+
+async def optimize_remote(pdf_path: str, level: int, output_path: str):
+    """
+    Optimizes a PDF through the merge service and saves the result to output_path.
+    """
+    with open(pdf_path, 'rb') as pdf_file:
+        files = {'file': (os.path.basename(pdf_path), pdf_file, 'application/pdf')}
+        await post_to_file(optimize_url, output_path, "Optimization failed.", files=files, data={'level': str(level)})
+
+
+def protect_local(pdf_path: str, password: str, output_path: str):
+    """
+    Protects a PDF with protect_pdf in this process and saves the result to output_path.
+    """
+    tmp_path = part_path(output_path)
+    try:
+        with open(pdf_path, 'rb') as pdf_file:
+            protect_pdf(pdf_file, password, tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def merge_local(pdf_paths: list, output_path: str, outlines: bool = False):
+    """
+    Merges PDFs with merge_pdfs in this process and saves the result to output_path.
+    """
+    tmp_path = part_path(output_path)
+    pdf_files = [open(pdf_path, 'rb') for pdf_path in pdf_paths]
+    try:
+        merge_pdfs(pdf_files, tmp_path, outlines=outlines)
+        os.replace(tmp_path, output_path)
+    finally:
+        for pdf_file in pdf_files:
+            pdf_file.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def optimize_local(pdf_path: str, level: int, output_path: str):
+    """
+    Optimizes a PDF with optimize_pdf in this process and saves the result to output_path.
+    """
+    tmp_path = part_path(output_path)
+    try:
+        optimize_pdf(pdf_path, tmp_path, level)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+async def protect_file(pdf_path: str, password: str, output_path: str):
+    """
+    Protects a PDF according to PIPELINE_MODE and saves the result to output_path.
+    """
+    with stage('protect'):
+        if PIPELINE_MODE == "local":
+            await asyncio.to_thread(protect_local, pdf_path, password, output_path)
+        else:
+            await protect_remote(pdf_path, password, output_path)
+
+
+async def protect_files(pdf_paths: list, password: str, output_paths: list):
+    """
+    Protects many PDFs according to PIPELINE_MODE: concurrently in this
+    process, or in one batch request to the password service.
+    """
+    with stage('protect'):
+        if PIPELINE_MODE == "local":
+            await asyncio.gather(*[
+                asyncio.to_thread(protect_local, pdf_path, password, output_path)
+                for pdf_path, output_path in zip(pdf_paths, output_paths)
+            ])
+        else:
+            await protect_batch_remote(pdf_paths, password, output_paths)
+
+
+async def merge_files(pdf_paths: list, output_path: str, outlines: bool = False):
+    """
+    Merges PDFs according to PIPELINE_MODE and saves the result to output_path,
+    keeping their bookmarks if outlines is set.
+    """
+    with stage('merge'):
+        if PIPELINE_MODE == "local":
+            await asyncio.to_thread(merge_local, pdf_paths, output_path, outlines)
+        else:
+            await merge_remote(pdf_paths, output_path, outlines)
+
+
+async def optimize_file(pdf_path: str, level: int, output_path: str) -> tuple:
+    """
+    Optimizes a PDF according to PIPELINE_MODE and saves the result to output_path.
+    Returns the sizes in bytes before and after.
+    """
+    before = os.path.getsize(pdf_path)
+    with stage('optimize'):
+        if PIPELINE_MODE == "local":
+            await asyncio.to_thread(optimize_local, pdf_path, level, output_path)
+        else:
+            await optimize_remote(pdf_path, level, output_path)
+    after = os.path.getsize(output_path)
+    print(f"Optimized {os.path.basename(pdf_path)}: {before} -> {after} bytes")
+    return before, after
\ No newline at end of file
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from prometheus_client import Counter, Gauge
+
+# Root of the per-request scratch directories. Point it at a tmpfs mount
+# (e.g. a memory-backed emptyDir) to keep intermediate files off the disk.
+SCRATCH_DIR = os.environ.get("SCRATCH_DIR", "/app/scratch")
+SCRATCH_MAX_BYTES = int(os.environ.get("SCRATCH_MAX_BYTES", 1024 * 1024 * 1024))
+# Directories older than this are treated as abandoned and removed by the sweeper
+SCRATCH_MAX_AGE = int(os.environ.get("SCRATCH_MAX_AGE", 60 * 60))
+SCRATCH_SWEEP_INTERVAL = int(os.environ.get("SCRATCH_SWEEP_INTERVAL", 60))
+
+SCRATCH_BYTES = Gauge('scratch_bytes', "Bytes used by request scratch directories.")
+SCRATCH_DIRS = Gauge('scratch_directories', "Request scratch directories on disk.")
+SCRATCH_REMOVED = Counter('scratch_directories_removed_total', "Scratch directories removed.", ['reason'])
+
+
+class ScratchFull(Exception):
+    """
+    Raised when the scratch space is over its quota.
+    """
+    status_code = 507
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ScratchSpace:
+    """
+    Per-request scratch directories under one root.
+
+    Each request creates its own directory for uploads and intermediate PDFs
+    and removes it once the response has been sent. A sweeper removes
+    directories older than max_age, which are left behind by crashed or
+    abandoned requests, and refreshes the usage figure new requests are
+    checked against: above max_bytes, create() raises ScratchFull.
+    """
+
+    def __init__(self, root: str = SCRATCH_DIR, max_bytes: int = SCRATCH_MAX_BYTES,
+                 max_age: int = SCRATCH_MAX_AGE, interval: int = SCRATCH_SWEEP_INTERVAL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.interval = interval
+        self.used = 0
+        self._lock = threading.Lock()
+        self._task = None
+
+    def create(self) -> str:
+        """
+        Returns a new, empty scratch directory.
+        """
+        # Checked against the sweeper's last count, so the quota is never
+        # recounted on the event loop
+        if self.used > self.max_bytes:
+            raise ScratchFull("Not enough scratch space, try again later.", self.interval)
+        os.makedirs(self.root, exist_ok=True)
+        path = tempfile.mkdtemp(dir=self.root)
+        SCRATCH_DIRS.inc()
+        return path
+
+    def remove(self, path: str, reason: str = 'done'):
+        """
+        Removes a scratch directory and everything in it.
+        """
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            SCRATCH_DIRS.dec()
+            SCRATCH_REMOVED.labels(reason).inc()
+
+    def sweep(self):
+        """
+        Removes expired scratch directories and recounts the space in use.
+        """
+        with self._lock:
+            if not os.path.isdir(self.root):
+                return
+            now = time.time()
+            used = 0
+            count = 0
+            for entry in os.scandir(self.root):
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                if now - entry.stat().st_mtime > self.max_age:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    SCRATCH_REMOVED.labels('expired').inc()
+                    continue
+                count += 1
+                for dirpath, _, filenames in os.walk(entry.path):
+                    for filename in filenames:
+                        try:
+                            used += os.path.getsize(os.path.join(dirpath, filename))
+                        except OSError:
+                            pass
+            self.used = used
+            SCRATCH_BYTES.set(used)
+            SCRATCH_DIRS.set(count)
+
+    def start(self):
+        """
+        Starts the sweeper on the running event loop.
+        """
+        self._task = asyncio.create_task(self._sweeper())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.to_thread(self.sweep)
+            await asyncio.sleep(self.interval)
+
+
+scratch_space = ScratchSpace()
\ No newline at end of file
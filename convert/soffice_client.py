@@ -0,0 +1,57 @@
+"""
+Exports one document to PDF through a running LibreOffice UNO listener.
+
+Run with a Python that has the LibreOffice UNO bindings (python3-uno):
+
+    python3 soffice_client.py <port> <input> <output>
+"""
+import os
+import sys
+import time
+
+import uno
+from com.sun.star.beans import PropertyValue
+from com.sun.star.connection import NoConnectException
+
+# How long to wait for a freshly started listener to accept connections
+CONNECT_TIMEOUT = 60
+
+
+def prop(name, value):
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+
+def connect(port: int):
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while True:
+        try:
+            return resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+        except NoConnectException:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def main(port: str, input_path: str, output_path: str):
+    context = connect(int(port))
+    desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+    document = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(os.path.abspath(input_path)), "_blank", 0, (prop("Hidden", True),)
+    )
+    if document is None:
+        sys.exit(f"LibreOffice could not open {input_path}")
+    try:
+        document.storeToURL(
+            uno.systemPathToFileUrl(os.path.abspath(output_path)), (prop("FilterName", "writer_pdf_Export"),)
+        )
+    finally:
+        document.close(True)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:4])
\ No newline at end of file
@@ -0,0 +1,50 @@
+import asyncio
+from zipfile import ZipFile, ZipInfo
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ZipSink:
+    """
+    Write-only file object that collects what ZipFile writes so it can be
+    sent to the client. ZipFile treats it as unseekable and writes data
+    descriptors after each entry instead of seeking back.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+async def stream_zip(entries):
+    """
+    Yields a zip archive chunk by chunk, adding each entry as it arrives.
+
+    Args:
+        entries (AsyncIterator[Tuple[str, str]]): (path, arcname) pairs of the files to add.
+    """
+    sink = ZipSink()
+    with ZipFile(sink, 'w') as zipf:
+        async for path, arcname in entries:
+            with open(path, 'rb') as src, zipf.open(ZipInfo.from_file(path, arcname), 'w') as dest:
+                while chunk := await asyncio.to_thread(src.read, CHUNK_SIZE):
+                    dest.write(chunk)
+                    yield sink.pop()
+            yield sink.pop()
+    yield sink.pop()
\ No newline at end of file
@@ -1,6 +1,15 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from collections import OrderedDict, namedtuple
+import hashlib
+import json
 import os
+import shutil
+import tempfile
+import threading
+import time
 from io import BytesIO
 
 # Base URLs for backend services
@@ -8,6 +17,169 @@ convert_url = "http://convert:8000"
 password_url = "http://password:8001"
 merge_url = "http://merge:8002"
 
+# Conversion engines offered by the convert service, default first
+engines = ["xelatex", "libreoffice", "weasyprint", "wkhtmltopdf", "tectonic"]
+
+# Size optimization levels understood by the convert and merge services
+optimize_levels = {
+    0: "Off",
+    1: "Deduplicate objects",
+    2: "Recompress streams",
+    3: "Downsample images",
+    4: "Subset fonts",
+}
+
+# Results are kept on disk, shared by all sessions, so reruns and repeated
+# requests with the same files and options don't upload and convert again
+CACHE_DIR = os.environ.get("FRONTEND_CACHE_DIR", os.path.join(tempfile.gettempdir(), "frontend-cache"))
+CACHE_MAX_BYTES = int(os.environ.get("FRONTEND_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CHUNK_SIZE = 1024 * 1024
+
+# Pooled keep-alive connections to the backend services
+SERVICE_CONNECTIONS = int(os.environ.get("SERVICE_CONNECTIONS", 10))
+SERVICE_TIMEOUT = float(os.environ.get("SERVICE_TIMEOUT", 600))
+
+docx_mime = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+CachedResult = namedtuple('CachedResult', ['path', 'size', 'headers'])
+
+
+class BackendError(Exception):
+    pass
+
+
+class ResultCache:
+    """
+    Backend responses saved to disk, least recently used evicted first once
+    they take more than max_bytes.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        # Entries don't survive a restart
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str) -> CachedResult:
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None:
+                return None
+            self.entries.move_to_end(key)
+            return result
+
+    def save(self, key: str, response: requests.Response) -> CachedResult:
+        """
+        Streams the response body to disk and caches it under key.
+        """
+        path = os.path.join(self.directory, key)
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+            with self.lock:
+                os.replace(tmp_path, path)
+                previous = self.entries.pop(key, None)
+                if previous is not None:
+                    self.size -= previous.size
+                result = CachedResult(path, size, CaseInsensitiveDict(response.headers))
+                self.entries[key] = result
+                self.size += size
+                # Keep the newest entry even if it alone is over the limit
+                while self.size > self.max_bytes and len(self.entries) > 1:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= evicted.size
+                    os.remove(evicted.path)
+            return result
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=3, pool_maxsize=SERVICE_CONNECTIONS)
+    session.mount('http://', adapter)
+    return session
+
+
+@st.cache_resource
+def result_cache() -> ResultCache:
+    return ResultCache()
+
+
+def result_key(files: list, **options) -> str:
+    """
+    Hashes the contents of the uploaded files and the options that shape the result.
+    Each upload is hashed once per session, in place, and its digest remembered
+    by file_id, so reruns don't copy and hash every upload again.
+    """
+    digests = st.session_state.setdefault('upload_digests', {})
+    digest = hashlib.sha256()
+    for file in files:
+        if file.file_id not in digests:
+            digests[file.file_id] = hashlib.sha256(file.getbuffer()).digest()
+        digest.update(digests[file.file_id])
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def upload(file, mime: str) -> tuple:
+    # Send the uploaded buffer itself rather than a copy of its bytes
+    file.seek(0)
+    return (file.name, file, mime)
+
+
+def viewer_headers() -> dict:
+    """
+    Names the viewer to the backend services, so each viewer is queued as its
+    own client: the address the ingress passed in X-Client-Address, or the
+    address the browser connected from.
+    """
+    address = st.context.headers.get('X-Client-Address') or st.context.ip_address
+    return {'X-Client-Address': address} if address else {}
+
+
+def error_detail(response: requests.Response) -> str:
+    # Attempt to parse error message; fallback to unknown error
+    try:
+        return response.json().get('detail', 'Unknown error')
+    except Exception:
+        return 'Unknown error'
+
+
+def request_result(key: str, method: str, url: str, **kwargs) -> CachedResult:
+    """
+    Sends a request to a backend service and caches the streamed response under key.
+    Raises BackendError with the service's error detail if it fails.
+    """
+    with http_session().request(method, url, stream=True, timeout=SERVICE_TIMEOUT, headers=viewer_headers(), **kwargs) as response:
+        if response.status_code != 200:
+            raise BackendError(error_detail(response))
+        return result_cache().save(key, response)
+
+
+def show_result(result: CachedResult, label: str, file_name: str, mime: str):
+    """
+    Shows the size saved by optimization, if any, and a download button for the result.
+    """
+    if 'X-Size-After' in result.headers:
+        st.write(f"Size: {int(result.headers['X-Size-Before']):,} -> {int(result.headers['X-Size-After']):,} bytes")
+    try:
+        with open(result.path, 'rb') as f:
+            st.download_button(label=label, data=f, file_name=file_name, mime=mime)
+    except FileNotFoundError:
+        # Evicted by another session since it was looked up
+        st.warning("The result has expired, please run it again.")
+
 def main():
     st.title("Document Processing Application")
 
@@ -42,6 +214,17 @@ def convert_word_to_pdf():
 
     if uploaded_files:
         num_files = len(uploaded_files)
+        engine = st.selectbox(
+            "Conversion engine",
+            engines,
+            help="xelatex handles math best; libreoffice and the HTML engines are faster on plain documents."
+        )
+        optimize = st.selectbox(
+            "Size optimization",
+            list(optimize_levels),
+            format_func=optimize_levels.get,
+            help="Each level includes the ones above it."
+        )
 
         if num_files == 1:
             st.write("**1 file uploaded.**")
@@ -51,37 +234,35 @@ def convert_word_to_pdf():
             if protect_with_password:
                 password = st.text_input("Enter a password", type="password")
 
-            if st.button("Convert"):
-                file = uploaded_files[0]
-                files = {
-                    'file': (
-                        file.name,
-                        file.getvalue(),
-                        'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                    )
-                }
-                data = {}
-                if password:
-                    data['password'] = password
+            file = uploaded_files[0]
+            data = {'engine': engine, 'optimize': optimize}
+            if password:
+                data['password'] = password
+            key = result_key(uploaded_files, endpoint='convert', **data)
+            result = result_cache().get(key)
+
+            if st.button("Convert") and result is None:
+                files = {'file': upload(file, docx_mime)}
 
                 with st.spinner('Converting...'):
                     try:
-                        response = requests.post(f"{convert_url}/convert", files=files, data=data)
-                        if response.status_code == 200:
-                            st.success("Conversion successful!")
-
-                            # Provide a download button
-                            st.download_button(
-                                label="Download PDF",
-                                data=response.content,
-                                file_name=file.name.replace('.docx', '.pdf').replace('.doc', '.pdf'),
-                                mime='application/pdf'
-                            )
-                        else:
-                            st.error(f"Conversion failed: {response.json().get('detail', 'Unknown error')}")
+                        result = request_result(key, 'POST', f"{convert_url}/convert", files=files, data=data)
+                    except BackendError as e:
+                        st.error(f"Conversion failed: {e}")
                     except Exception as e:
                         st.error(f"An error occurred: {str(e)}")
 
+            if result is not None:
+                st.success("Conversion successful!")
+
+                # Provide a download button
+                show_result(
+                    result,
+                    label="Download PDF",
+                    file_name=file.name.replace('.docx', '.pdf').replace('.doc', '.pdf'),
+                    mime='application/pdf'
+                )
+
         elif num_files > 1:
             st.write(f"**{num_files} files uploaded.**")
             # Show password protect checkbox
@@ -93,47 +274,64 @@ def convert_word_to_pdf():
             # Show merge option
             merge_option = st.checkbox("Merge PDFs into a single PDF")
 
-            if st.button("Convert"):
-                files = []
-                for file in uploaded_files:
-                    files.append(('files', (
-                        file.name,
-                        file.getvalue(),
-                        'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                    )))
-
-                data = {}
-                if password:
-                    data['password'] = password
-                if merge_option:
-                    data['merge'] = 'true'
+            data = {'engine': engine, 'optimize': optimize}
+            if password:
+                data['password'] = password
+            if merge_option:
+                data['merge'] = 'true'
+            key = result_key(uploaded_files, endpoint='jobs', **data)
+            result = result_cache().get(key)
 
-                with st.spinner('Converting...'):
-                    try:
-                        response = requests.post(f"{convert_url}/bulk_convert", files=files, data=data)
-                        if response.status_code == 200:
-                            st.success("Conversion successful!")
-
-                            if merge_option:
-                                # Provide a download button for the merged PDF
-                                st.download_button(
-                                    label="Download Merged PDF",
-                                    data=response.content,
-                                    file_name="merged.pdf",
-                                    mime='application/pdf'
-                                )
-                            else:
-                                # Provide a download button for the ZIP file
-                                st.download_button(
-                                    label="Download ZIP of PDFs",
-                                    data=response.content,
-                                    file_name="converted_pdfs.zip",
-                                    mime='application/zip'
-                                )
-                        else:
-                            st.error(f"Conversion failed: {response.json().get('detail', 'Unknown error')}")
-                    except Exception as e:
-                        st.error(f"An error occurred: {str(e)}")
+            if st.button("Convert") and result is None:
+                files = [('files', upload(file, docx_mime)) for file in uploaded_files]
+
+                try:
+                    # Submit as a background job and poll it, so large batches
+                    # don't hold one request open for the whole conversion
+                    response = http_session().post(f"{convert_url}/jobs", files=files, data=data, headers=viewer_headers(), timeout=SERVICE_TIMEOUT)
+                    if response.status_code != 200:
+                        st.error(f"Conversion failed: {error_detail(response)}")
+                        return
+                    job_id = response.json()['job_id']
+                    progress_bar = st.progress(0.0, text="Queued...")
+                    while True:
+                        job = http_session().get(f"{convert_url}/jobs/{job_id}", timeout=SERVICE_TIMEOUT).json()
+                        progress_bar.progress(
+                            job['completed'] / job['total'],
+                            text=f"Converted {job['completed']} of {job['total']} files"
+                        )
+                        if job['status'] in ('done', 'failed'):
+                            break
+                        time.sleep(1)
+
+                    if job['status'] == 'failed':
+                        st.error(f"Conversion failed: {job['error']}")
+                        return
+                    result = request_result(key, 'GET', f"{convert_url}/jobs/{job_id}/result")
+                except BackendError as e:
+                    st.error(f"Conversion failed: {e}")
+                except Exception as e:
+                    st.error(f"An error occurred: {str(e)}")
+
+            if result is not None:
+                st.success("Conversion successful!")
+
+                if merge_option:
+                    # Provide a download button for the merged PDF
+                    show_result(
+                        result,
+                        label="Download Merged PDF",
+                        file_name="merged.pdf",
+                        mime='application/pdf'
+                    )
+                else:
+                    # Provide a download button for the ZIP file
+                    show_result(
+                        result,
+                        label="Download ZIP of PDFs",
+                        file_name="converted_pdfs.zip",
+                        mime='application/zip'
+                    )
     else:
         st.info("Please upload at least one Word (.docx, .doc) file.")
 
@@ -152,40 +350,33 @@ def password_protect_pdf():
         password = st.text_input("Enter a password", type="password")
         
         if password:
-            if st.button("Protect PDF"):
-                files = {
-                    'file': (
-                        uploaded_file.name,
-                        uploaded_file.getvalue(),
-                        'application/pdf'
-                    )
-                }
-                data = {
-                    'password': password
-                }
+            data = {
+                'password': password
+            }
+            key = result_key([uploaded_file], endpoint='protect', **data)
+            result = result_cache().get(key)
+
+            if st.button("Protect PDF") and result is None:
+                files = {'file': upload(uploaded_file, 'application/pdf')}
 
                 with st.spinner('Protecting PDF...'):
                     try:
-                        response = requests.post(f"{password_url}/protect", files=files, data=data)
-                        if response.status_code == 200:
-                            st.success("PDF has been password protected!")
-
-                            # Provide a download button
-                            st.download_button(
-                                label="Download Protected PDF",
-                                data=response.content,
-                                file_name="protected_" + uploaded_file.name,
-                                mime='application/pdf'
-                            )
-                        else:
-                            # Attempt to parse error message; fallback to unknown error
-                            try:
-                                error_detail = response.json().get('detail', 'Unknown error')
-                            except:
-                                error_detail = 'Unknown error'
-                            st.error(f"Password protection failed: {error_detail}")
+                        result = request_result(key, 'POST', f"{password_url}/protect", files=files, data=data)
+                    except BackendError as e:
+                        st.error(f"Password protection failed: {e}")
                     except Exception as e:
                         st.error(f"An error occurred: {str(e)}")
+
+            if result is not None:
+                st.success("PDF has been password protected!")
+
+                # Provide a download button
+                show_result(
+                    result,
+                    label="Download Protected PDF",
+                    file_name="protected_" + uploaded_file.name,
+                    mime='application/pdf'
+                )
         else:
             st.warning("Please enter a password to protect the PDF.")
     else:
@@ -197,10 +388,16 @@ def merge_pdfs():
     Function to merge PDF files.
     - Uses the merge endpoint of the merge service.
     - Provides an option to upload multiple PDF files to merge.
+    - Provides an option to append them to an existing PDF instead.
+    - Provides an optional page range per file, e.g. "1-3,7", to merge only those pages.
     - Provides a download button to download the merged pdf file
     """
     st.header("Merge PDFs")
 
+    base_file = st.file_uploader(
+        "Existing PDF to append to (optional)",
+        type=["pdf"]
+    )
     uploaded_files = st.file_uploader(
         "Upload PDF files to merge",
         type=["pdf"],
@@ -208,35 +405,51 @@ def merge_pdfs():
     )
 
     if uploaded_files:
-        if len(uploaded_files) < 2:
+        if len(uploaded_files) < 2 and base_file is None:
             st.warning("Please upload at least two PDF files to merge.")
         else:
-            if st.button("Merge PDFs"):
+            page_ranges = [
+                st.text_input(f"Pages of {file.name} (e.g. 1-3,7; empty for all)", key=f"pages_{i}")
+                for i, file in enumerate(uploaded_files)
+            ]
+            optimize = 0
+            if base_file is None:
+                optimize = st.selectbox(
+                    "Size optimization",
+                    list(optimize_levels),
+                    format_func=optimize_levels.get,
+                    help="Each level includes the ones above it."
+                )
+            data = {'pages': page_ranges, 'optimize': optimize}
+            inputs = ([base_file] if base_file is not None else []) + uploaded_files
+            key = result_key(inputs, endpoint='merge', base=base_file is not None, **data)
+            result = result_cache().get(key)
+
+            if st.button("Merge PDFs") and result is None:
                 files = []
+                if base_file is not None:
+                    files.append(('base', upload(base_file, 'application/pdf')))
                 for file in uploaded_files:
-                    files.append(('files', (
-                        file.name,
-                        file.getvalue(),
-                        'application/pdf'
-                    )))
+                    files.append(('files', upload(file, 'application/pdf')))
 
                 with st.spinner('Merging PDFs...'):
                     try:
-                        response = requests.post(f"{merge_url}/merge", files=files)
-                        if response.status_code == 200:
-                            st.success("PDFs merged successfully!")
-
-                            # Provide a download button
-                            st.download_button(
-                                label="Download Merged PDF",
-                                data=response.content,
-                                file_name="merged.pdf",
-                                mime='application/pdf'
-                            )
-                        else:
-                            st.error(f"Merging failed: {response.json().get('detail', 'Unknown error')}")
+                        result = request_result(key, 'POST', f"{merge_url}/merge", files=files, data=data)
+                    except BackendError as e:
+                        st.error(f"Merging failed: {e}")
                     except Exception as e:
                         st.error(f"An error occurred: {str(e)}")
+
+            if result is not None:
+                st.success("PDFs merged successfully!")
+
+                # Provide a download button
+                show_result(
+                    result,
+                    label="Download Merged PDF",
+                    file_name="merged.pdf",
+                    mime='application/pdf'
+                )
     else:
         st.info("Please upload PDF files.")
 
@@ -1,34 +1,228 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import Response
-from merge import merge_pdfs
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from merge import append_pdfs, merge_pdfs, open_mapped, select_pages
+from optimize import optimize_pdf, LEVELS
+from pypdf import PdfReader
+from limits import install as install_limits, upload_size, MAX_FILE_SIZE
+from metrics import install as install_metrics, stage
 from io import BytesIO
+import asyncio
+import os
+import queue
+import tempfile
+import threading
 
 app = FastAPI()
+install_limits(app)
+install_metrics(app)
+
+def check_optimize(level: int):
+    if level not in LEVELS:
+        raise HTTPException(status_code=400, detail="Optimization level must be from 0 to 4.")
+
+def size_headers(sizes: tuple) -> dict:
+    return {'X-Size-Before': str(sizes[0]), 'X-Size-After': str(sizes[1])}
+
+class PipeWriter:
+    """
+    Write-only file object that hands PdfWriter output to the response in
+    bounded chunks, so the merged PDF is never held in memory or on disk.
+    """
+
+    def __init__(self, maxsize: int = 8):
+        self.chunks = queue.Queue(maxsize=maxsize)
+        self.offset = 0
+        self.closed = threading.Event()
+
+    def write(self, data) -> int:
+        while True:
+            if self.closed.is_set():
+                raise IOError("Client disconnected")
+            try:
+                self.chunks.put(bytes(data), timeout=1)
+                break
+            except queue.Full:
+                continue
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.offset
+
+    def flush(self):
+        pass
+
+async def stream_merge(mapped: list, readers: list, pages: list = None):
+    """
+    Merges the parsed uploads in a worker thread and yields the output as it is written.
+    """
+    pipe = PipeWriter()
+    errors = []
+
+    def run():
+        try:
+            with stage('merge'):
+                merge_pdfs(readers, pipe, share_resources=True, pages=pages)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            pipe.chunks.put(None)
+
+    worker = asyncio.get_running_loop().run_in_executor(None, run)
+    try:
+        while (chunk := await asyncio.to_thread(pipe.chunks.get)) is not None:
+            yield chunk
+        if errors:
+            # The status line is already sent, so the client sees a truncated PDF
+            raise errors[0]
+    finally:
+        pipe.closed.set()
+        # Unblock a writer waiting on a full queue, then release the maps
+        while not pipe.chunks.empty():
+            pipe.chunks.get_nowait()
+        await worker
+        for m in mapped:
+            m.close()
 
 @app.post("/merge")
-async def merge_pdfs_endpoint(files: list[UploadFile] = File(...)):
+async def merge_pdfs_endpoint(
+    files: list[UploadFile] = File(...),
+    low_memory: bool = Form(False),
+    base: UploadFile = File(None),
+    pages: list[str] = Form(None),
+    optimize: int = Form(0),
+    outlines: bool = Form(False)
+):
     """
     Endpoint to merge multiple PDF files into a single PDF.
         - Uses the merge_pdfs helper function
-            - Essential logic - uses the PyPDF2 library to merge multiple PDF files.
+            - Essential logic - uses the pypdf library to merge multiple PDF files.
             - Args:
-                - pdf_contents (List[bytes]): List of byte contents of the PDF files to merge.
+                - input_pdfs (List[file]): The uploaded PDF files, read from their spooled temporary files.
+        - With low_memory set, the uploads are memory-mapped, fonts and images shared
+          between inputs are stored once, and the output is streamed as it is written.
+        - With base set, files are appended to base as an incremental update using the
+          append_pdfs helper function: base is copied as is rather than re-parsed and rewritten.
+        - pages optionally gives one page range spec per file, e.g. "1-3,7" or "5-1",
+          selecting and ordering its pages; "" or "all" keeps every page. Only the
+          selected pages are loaded and copied.
+        - With outlines set, the bookmarks of each file are kept (not with base or low_memory).
+        - optimize (0-4) shrinks the merged PDF with the optimize_pdf helper function and
+          reports the sizes in X-Size-Before/X-Size-After. Not available with base or
+          low_memory, which avoid rewriting or buffering the whole output.
         - Returns the merged PDF file as a response.
     """
-    if len(files) < 2:
+    if base is None and len(files) < 2:
         raise HTTPException(status_code=400, detail="Please upload at least two PDF files to merge.")
+    if pages is not None and len(pages) != len(files):
+        raise HTTPException(status_code=400, detail="Please give one page range per file.")
+    check_optimize(optimize)
+    if optimize and (base is not None or low_memory):
+        raise HTTPException(status_code=400, detail="Optimization can't be combined with base or low_memory.")
     
-    pdf_contents = []
+    for file in files + ([base] if base is not None else []):
+        if not file.filename.endswith('.pdf'):
+            raise HTTPException(status_code=400, detail=f"Invalid file format detected: {file.filename}")
+        if upload_size(file) > MAX_FILE_SIZE:
+            raise HTTPException(status_code=413, detail=f"File too large: {file.filename}")
+
+    if base is not None:
+        fd, output_path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        try:
+            with stage('append'):
+                await asyncio.to_thread(append_pdfs, base.file, [file.file for file in files], output_path, pages)
+        except HTTPException:
+            os.remove(output_path)
+            raise
+        except Exception as e:
+            os.remove(output_path)
+            raise HTTPException(status_code=500, detail=str(e))
+        return FileResponse(
+            path=output_path,
+            media_type='application/pdf',
+            background=BackgroundTask(os.remove, output_path)
+        )
+
+    if low_memory:
+        # Parse the inputs before the response starts so bad files still get a 500
+        mapped = []
+        try:
+            for file in files:
+                mapped.append(open_mapped(file.file))
+            readers = await asyncio.to_thread(lambda: [PdfReader(m) for m in mapped])
+            for reader, spec in zip(readers, pages or []):
+                select_pages(spec, len(reader.pages))
+        except Exception as e:
+            for m in mapped:
+                m.close()
+            if isinstance(e, ValueError):
+                raise HTTPException(status_code=400, detail=str(e))
+            raise HTTPException(status_code=500, detail=f"Merging failed: {e}")
+        return StreamingResponse(stream_merge(mapped, readers, pages), media_type='application/pdf')
+
+    fd, output_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
     try:
-        for file in files:
-            if not file.filename.endswith('.pdf'):
-                raise HTTPException(status_code=400, detail=f"Invalid file format detected: {file.filename}")
-            content = await file.read()
-            pdf_contents.append(content)
-        
         # Merge PDFs
-        merged_pdf = merge_pdfs(pdf_contents)
+        with stage('merge'):
+            await asyncio.to_thread(merge_pdfs, [file.file for file in files], output_path, pages=pages, outlines=outlines)
+
+        headers = {}
+        if optimize:
+            with stage('optimize'):
+                sizes = await asyncio.to_thread(optimize_pdf, output_path, output_path, optimize)
+            headers = size_headers(sizes)
         
-        return Response(content=merged_pdf, media_type='application/pdf')
+        return FileResponse(
+            path=output_path,
+            media_type='application/pdf',
+            headers=headers,
+            background=BackgroundTask(os.remove, output_path)
+        )
+    except HTTPException:
+        os.remove(output_path)
+        raise
+    except Exception as e:
+        os.remove(output_path)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/optimize")
+async def optimize_pdf_endpoint(file: UploadFile = File(...), level: int = Form(2)):
+    """
+    Endpoint to make a PDF smaller.
+        - Uses the optimize_pdf helper function
+            - Essential logic - uses the pypdf library to deduplicate objects, recompress
+              content streams, downsample images and subset fonts.
+            - Args:
+                - input_pdf (file): The uploaded PDF file.
+                - level (int): How far to go, from 0 (unchanged) to 4.
+        - Returns the optimized PDF file as a response, with the sizes in bytes
+          before and after in the X-Size-Before and X-Size-After headers.
+    """
+    check_optimize(level)
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail=f"Invalid file format detected: {file.filename}")
+    if upload_size(file) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail=f"File too large: {file.filename}")
+
+    fd, output_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        with stage('optimize'):
+            sizes = await asyncio.to_thread(optimize_pdf, file.file, output_path, level)
+    except HTTPException:
+        os.remove(output_path)
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        os.remove(output_path)
+        raise HTTPException(status_code=500, detail=str(e))
+    return FileResponse(
+        path=output_path,
+        media_type='application/pdf',
+        filename=file.filename,
+        headers=size_headers(sizes),
+        background=BackgroundTask(os.remove, output_path)
+    )
\ No newline at end of file
@@ -1,26 +1,291 @@
-from PyPDF2 import PdfReader, PdfWriter
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+from pypdf.generic import NameObject, NullObject, NumberObject
 from fastapi import HTTPException
 from io import BytesIO
+import hashlib
+import mmap
+import re
+import shutil
+import struct
+import zlib
 
-def merge_pdfs(input_pdfs: list) -> bytes:
+def open_mapped(pdf_file) -> mmap.mmap:
+    """
+    Memory-maps an open binary PDF file so PdfReader pages it in on demand
+    instead of holding a copy of it on the heap.
+    """
+    return mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _digest(obj, memo: dict, visiting: set) -> bytes:
+    """
+    Returns a content digest of obj with indirect references resolved, so
+    identical objects coming from different input PDFs get the same digest.
+    """
+    if isinstance(obj, IndirectObject):
+        key = (id(obj.pdf), obj.idnum)
+        if key in memo:
+            return memo[key]
+        if key in visiting:
+            return b'cycle'
+        visiting.add(key)
+        digest = _digest(obj.get_object(), memo, visiting)
+        visiting.discard(key)
+        memo[key] = digest
+        return digest
+    h = hashlib.sha256(type(obj).__name__.encode())
+    if isinstance(obj, DictionaryObject):
+        for k in sorted(obj.keys()):
+            h.update(k.encode() + _digest(obj.raw_get(k), memo, visiting))
+        if isinstance(obj, StreamObject):
+            h.update(obj._data)
+    elif isinstance(obj, ArrayObject):
+        for item in obj:
+            h.update(_digest(item, memo, visiting))
+    else:
+        h.update(repr(obj).encode())
+    return h.digest()
+
+def _share_resources(page, shared: dict, memo: dict):
+    """
+    Points the page's fonts and images at the first identical copy seen in
+    any input, so the writer stores each shared resource once.
+    """
+    resources = page.get('/Resources')
+    if resources is None:
+        return
+    resources = resources.get_object()
+    for category in ('/Font', '/XObject'):
+        entries = resources.get(category)
+        if entries is None:
+            continue
+        entries = entries.get_object()
+        for name in list(entries.keys()):
+            ref = entries.raw_get(name)
+            if not isinstance(ref, IndirectObject):
+                continue
+            digest = _digest(ref, memo, set())
+            entries[name] = shared.setdefault(digest, ref)
+
+def select_pages(spec: str, count: int) -> list:
+    """
+    Returns the 0-based page indexes selected by a page range spec such as "1-3,7,10-".
+
+    Pages are numbered from 1. "A-B" is inclusive and runs backwards when A > B,
+    "A-" runs to the last page, "-B" covers the first B pages, and an empty
+    spec or "all" selects every page. Indexes are returned in the order given.
+    Raises ValueError for malformed specs and pages outside 1..count.
+    """
+    spec = (spec or '').strip()
+    if spec in ('', 'all'):
+        return list(range(count))
+    indexes = []
+    for part in spec.split(','):
+        part = part.strip()
+        match = re.fullmatch(r'(\d*)\s*-\s*(\d*)|(\d+)', part)
+        if not match or part == '-':
+            raise ValueError(f"Invalid page range: {part!r}")
+        if match.group(3):
+            start = end = int(match.group(3))
+        else:
+            start, end = int(match.group(1) or 1), int(match.group(2) or count)
+        for number in (start, end):
+            if not 1 <= number <= count:
+                raise ValueError(f"Page {number} is out of range 1-{count}")
+        step = 1 if end >= start else -1
+        indexes.extend(range(start - 1, end - 1 + step, step))
+    return indexes
+
+def _selected_pages(pdf_reader: PdfReader, spec: str = None) -> list:
+    """
+    Returns the pages of pdf_reader selected by spec. Only the page
+    dictionaries are read; the content and resources of unselected pages
+    are never loaded.
+    """
+    try:
+        indexes = select_pages(spec, len(pdf_reader.pages))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [pdf_reader.pages[i] for i in indexes]
+
+def _copy_outline(pdf_writer: PdfWriter, pdf_reader: PdfReader, outline: list, page_map: dict, parent=None):
+    """
+    Adds the bookmarks in outline that point to copied pages to pdf_writer.
+    page_map maps page numbers in pdf_reader to page numbers in pdf_writer.
+    """
+    item = parent
+    for entry in outline:
+        if isinstance(entry, list):
+            # Children of the bookmark before; kept under its parent if it was dropped
+            _copy_outline(pdf_writer, pdf_reader, entry, page_map, item)
+            continue
+        item = parent
+        page = page_map.get(pdf_reader.get_destination_page_number(entry))
+        if page is not None:
+            item = pdf_writer.add_outline_item(entry.title, page, parent)
+
+def merge_pdfs(input_pdfs: list, output=None, share_resources: bool = False, pages: list = None, outlines: bool = False) -> bytes:
     """
     Merges multiple PDF files into one.
     
     Args:
-        input_pdfs (list): List of PDF files in bytes.
+        input_pdfs (list): List of PDF files, as bytes, binary file-like
+            objects (including memory maps from open_mapped) or PdfReaders.
+        output: Optional path or binary file object to write the merged PDF to.
+            When given, the merged PDF is not returned.
+        share_resources (bool): Store fonts and images that are identical
+            across inputs only once in the merged PDF.
+        pages (list): Optional page range spec per input (see select_pages),
+            selecting and ordering the pages copied from it. None or an
+            empty spec copies every page.
+        outlines (bool): Keep the bookmarks of each input that point to
+            copied pages. This reads every page dictionary of the inputs.
     
     """
     pdf_writer = PdfWriter()
+    shared, memo = {}, {}
+    pages = pages or [None] * len(input_pdfs)
     
     try:
-        for pdf_bytes in input_pdfs:
-            pdf_reader = PdfReader(BytesIO(pdf_bytes))
-            for page in pdf_reader.pages:
+        for pdf, spec in zip(input_pdfs, pages):
+            if isinstance(pdf, PdfReader):
+                pdf_reader = pdf
+            else:
+                pdf_reader = PdfReader(BytesIO(pdf) if isinstance(pdf, bytes) else pdf)
+            start = len(pdf_writer.pages)
+            for page in _selected_pages(pdf_reader, spec):
+                if share_resources:
+                    _share_resources(page, shared, memo)
                 pdf_writer.add_page(page)
+            if outlines and pdf_reader.outline:
+                page_map = {}
+                for offset, index in enumerate(select_pages(spec, len(pdf_reader.pages))):
+                    page_map.setdefault(index, start + offset)
+                _copy_outline(pdf_writer, pdf_reader, pdf_reader.outline, page_map)
         
+        if output is not None:
+            pdf_writer.write(output)
+            return None
         output = BytesIO()
         pdf_writer.write(output)
         merged_pdf = output.getvalue()
         return merged_pdf
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Merging failed: {e}")
+
+def _startxref(base) -> int:
+    """
+    Returns the offset of the last cross-reference section of a PDF file.
+    """
+    base.seek(0, 2)
+    size = base.tell()
+    base.seek(max(0, size - 1024))
+    offsets = re.findall(rb'startxref\s+(\d+)', base.read())
+    if not offsets:
+        raise ValueError("startxref not found")
+    return int(offsets[-1])
+
+def _serialize(obj) -> bytes:
+    out = BytesIO()
+    obj.write_to_stream(out, None)
+    return out.getvalue()
+
+def append_pdfs(base_pdf, input_pdfs: list, output=None, pages: list = None) -> bytes:
+    """
+    Appends the pages of PDF files to an existing PDF as an incremental update.
+
+    Only the base's cross-reference data, catalog and page tree root are
+    parsed. The base is copied byte for byte, followed by the new pages and
+    their resources, an updated page tree root and a cross-reference stream
+    pointing back at the base's, so the cost of an append grows with the new
+    pages rather than the whole bundle.
+
+    Args:
+        base_pdf: The PDF to append to, as bytes or a binary file-like object.
+        input_pdfs (list): List of PDF files to append, as bytes or binary
+            file-like objects (including memory maps from open_mapped).
+        output: Optional path or binary file object to write the result to.
+            When given, the result is not returned.
+        pages (list): Optional page range spec per input, as in merge_pdfs.
+    """
+    pages = pages or [None] * len(input_pdfs)
+    try:
+        base = BytesIO(base_pdf) if isinstance(base_pdf, bytes) else base_pdf
+        base_reader = PdfReader(base)
+        if base_reader.is_encrypted:
+            raise ValueError("cannot append to an encrypted PDF")
+        trailer = base_reader.trailer
+        pages_ref = trailer['/Root'].get_object().raw_get('/Pages')
+        page_tree = pages_ref.get_object()
+
+        # Number the new objects after the base's, going by the xref data as
+        # well as /Size, which some writers get wrong. The writer's own info,
+        # page tree and catalog objects (ids 1-3) are never written.
+        idnums = list(base_reader.xref_objStm) + [i for section in base_reader.xref.values() for i in section]
+        pdf_writer = PdfWriter()
+        first_id = max([int(trailer.get('/Size', 0)), len(pdf_writer._objects) + 1] + [i + 1 for i in idnums])
+        pdf_writer._objects.extend(NullObject() for _ in range(first_id - 1 - len(pdf_writer._objects)))
+        new_pages = []
+        for pdf, spec in zip(input_pdfs, pages):
+            pdf_reader = PdfReader(BytesIO(pdf) if isinstance(pdf, bytes) else pdf)
+            for page in _selected_pages(pdf_reader, spec):
+                page = pdf_writer.add_page(page)
+                page[NameObject('/Parent')] = IndirectObject(pages_ref.idnum, pages_ref.generation, pdf_writer)
+                new_pages.append(page.indirect_reference)
+
+        page_tree[NameObject('/Kids')] = ArrayObject(list(page_tree['/Kids']) + new_pages)
+        page_tree[NameObject('/Count')] = NumberObject(page_tree['/Count'] + len(new_pages))
+
+        # The update section: new objects, the updated page tree root, then the xref stream
+        prev = _startxref(base)
+        base.seek(0, 2)
+        start = base.tell() + 1
+        update = BytesIO()
+        entries = {}
+        objects = [(pages_ref.idnum, pages_ref.generation, page_tree)]
+        objects += [(idnum, 0, obj) for idnum, obj in enumerate(pdf_writer._objects[first_id - 1:], first_id)]
+        for idnum, generation, obj in objects:
+            entries[idnum] = (start + update.tell(), generation)
+            update.write(f"{idnum} {generation} obj\n".encode() + _serialize(obj) + b"\nendobj\n")
+
+        xref_id = first_id + len(pdf_writer._objects[first_id - 1:])
+        xref_offset = start + update.tell()
+        entries[xref_id] = (xref_offset, 0)
+        index, rows = [], b''
+        for idnum in sorted(entries):
+            if index and index[-2] + index[-1] == idnum:
+                index[-1] += 1
+            else:
+                index += [idnum, 1]
+            offset, generation = entries[idnum]
+            rows += struct.pack('>BQH', 1, offset, generation)
+        rows = zlib.compress(rows)
+        xref = (
+            f"<< /Type /XRef /Size {xref_id + 1} /Index [{' '.join(map(str, index))}] /W [1 8 2] "
+            f"/Filter /FlateDecode /Length {len(rows)} /Prev {prev} "
+        ).encode()
+        for key in ('/Root', '/Info', '/ID'):
+            if key in trailer:
+                xref += key.encode() + b' ' + _serialize(trailer.raw_get(key)) + b' '
+        update.write(f"{xref_id} 0 obj\n".encode() + xref + b">>\nstream\n" + rows + b"\nendstream\nendobj\n")
+        update.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+        result = BytesIO() if output is None else output
+        close = isinstance(output, str)
+        if close:
+            result = open(output, 'wb')
+        try:
+            base.seek(0)
+            shutil.copyfileobj(base, result)
+            result.write(b"\n")
+            result.write(update.getvalue())
+        finally:
+            if close:
+                result.close()
+        return result.getvalue() if output is None else None
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Merging failed: {e}")
\ No newline at end of file
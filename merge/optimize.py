@@ -0,0 +1,217 @@
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject, ByteStringObject, ContentStream, DictionaryObject, NameObject, NumberObject, TextStringObject
+)
+from fastapi import HTTPException
+from io import BytesIO
+from prometheus_client import Counter
+import hashlib
+import os
+
+# Pillow and fontTools are optional; without them the image and font levels are skipped
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+try:
+    from fontTools.subset import Options, Subsetter
+    from fontTools.ttLib import TTFont
+except ImportError:
+    TTFont = None
+
+# Optimization levels, each including the ones below it
+NONE, DEDUPLICATE, RECOMPRESS, DOWNSAMPLE, SUBSET_FONTS = range(5)
+LEVELS = range(NONE, SUBSET_FONTS + 1)
+
+OPTIMIZE_MAX_DPI = int(os.environ.get("OPTIMIZE_MAX_DPI", 150))
+OPTIMIZE_JPEG_QUALITY = int(os.environ.get("OPTIMIZE_JPEG_QUALITY", 80))
+
+OPTIMIZE_BYTES = Counter('optimize_bytes_total', "PDF bytes before and after optimization.", ['stage'])
+
+
+def _downsample_images(writer: PdfWriter, max_dpi: int, quality: int):
+    """
+    Re-encodes images whose resolution is above max_dpi as JPEGs at max_dpi.
+
+    An image can't be shown larger than its page, so pixels per inch of page
+    is the lowest resolution it can have; only images above max_dpi even at
+    that size are downsampled. Images with transparency are left alone.
+    """
+    done = set()
+    for page in writer.pages:
+        width = float(page.mediabox.width) / 72
+        height = float(page.mediabox.height) / 72
+        for image in page.images:
+            ref = image.indirect_reference
+            if ref is None or ref.idnum in done:
+                continue
+            done.add(ref.idnum)
+            xobject = ref.get_object()
+            if '/SMask' in xobject or '/Mask' in xobject or xobject.get('/ImageMask'):
+                continue
+            img = image.image
+            if img.mode not in ('RGB', 'L'):
+                continue
+            scale = max(max_dpi * width / img.width, max_dpi * height / img.height)
+            if scale >= 1:
+                continue
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            image.replace(img.resize(size, Image.LANCZOS), quality=quality)
+
+
+def _raw(string) -> bytes:
+    if isinstance(string, TextStringObject):
+        return string.original_bytes
+    return bytes(string)
+
+
+def _collect_glyphs(content, resources, used: dict, fonts: dict, seen: set):
+    """
+    Records the codes shown with each font in a content stream and the form
+    XObjects it draws, keyed by font object number.
+    """
+    resources = resources.get_object() if resources is not None else DictionaryObject()
+    font_refs = resources.get('/Font', DictionaryObject()).get_object()
+    xobjects = resources.get('/XObject', DictionaryObject()).get_object()
+    current = None
+    for operands, operator in ContentStream(content, None).operations:
+        if operator == b'Tf':
+            ref = font_refs.raw_get(operands[0]) if operands[0] in font_refs else None
+            current = ref.idnum if hasattr(ref, 'idnum') else None
+            if current is not None:
+                fonts[current] = ref.get_object()
+            continue
+        if operator in (b'Tj', b"'"):
+            strings = [operands[0]]
+        elif operator == b'"':
+            strings = [operands[2]]
+        elif operator == b'TJ':
+            strings = [item for item in operands[0] if isinstance(item, (ByteStringObject, TextStringObject))]
+        elif operator == b'Do' and operands[0] in xobjects:
+            ref = xobjects.raw_get(operands[0])
+            form = ref.get_object()
+            if form.get('/Subtype') == '/Form' and getattr(ref, 'idnum', None) not in seen:
+                seen.add(getattr(ref, 'idnum', None))
+                _collect_glyphs(form, form.get('/Resources', resources), used, fonts, seen)
+            continue
+        else:
+            continue
+        if current is not None:
+            codes = used.setdefault(current, set())
+            for string in strings:
+                codes.add(_raw(string))
+
+
+def _subset_font(font: DictionaryObject, codes: set):
+    """
+    Subsets a fully embedded TrueType CID font with Identity-H encoding to
+    the glyphs in codes. Glyph ids are kept, so content streams stay valid.
+    Fonts that are already subsets or use other encodings are left alone.
+    """
+    if font.get('/Subtype') != '/Type0' or font.get('/Encoding') != '/Identity-H':
+        return
+    name = str(font.get('/BaseFont', ''))[1:]
+    if len(name) > 7 and name[6] == '+':
+        return
+    descendant = font['/DescendantFonts'][0].get_object()
+    descriptor = descendant['/FontDescriptor'].get_object()
+    if descendant.get('/CIDToGIDMap', '/Identity') != '/Identity' or '/FontFile2' not in descriptor:
+        return
+    stream = descriptor['/FontFile2'].get_object()
+    data = stream.get_data()
+
+    gids = {0}
+    for string in codes:
+        gids.update(int.from_bytes(string[i:i + 2], 'big') for i in range(0, len(string) - 1, 2))
+    options = Options()
+    options.retain_gids = True
+    options.notdef_outline = True
+    ttf = TTFont(BytesIO(data))
+    subsetter = Subsetter(options)
+    subsetter.populate(gids=sorted(gids))
+    subsetter.subset(ttf)
+    output = BytesIO()
+    ttf.save(output)
+    subset = output.getvalue()
+    if len(subset) >= len(data):
+        return
+
+    stream.set_data(subset)
+    stream[NameObject('/Length1')] = NumberObject(len(subset))
+    tag = ''.join(chr(ord('A') + b % 26) for b in hashlib.sha256(subset).digest()[:6])
+    for obj, key in ((font, '/BaseFont'), (descendant, '/BaseFont'), (descriptor, '/FontName')):
+        obj[NameObject(key)] = NameObject(f"/{tag}+{name}")
+
+
+def _subset_fonts(writer: PdfWriter):
+    used, fonts, seen = {}, {}, set()
+    for page in writer.pages:
+        contents = page.get_contents()
+        if contents is not None:
+            _collect_glyphs(contents, page.get('/Resources'), used, fonts, seen)
+        # Annotation appearances draw text too
+        for annot in page.get('/Annots', ArrayObject()):
+            appearance = annot.get_object().get('/AP', DictionaryObject()).get('/N')
+            if appearance is not None and appearance.get_object().get('/Subtype') == '/Form':
+                form = appearance.get_object()
+                _collect_glyphs(form, form.get('/Resources'), used, fonts, seen)
+    for idnum, font in fonts.items():
+        try:
+            _subset_font(font, used.get(idnum, set()))
+        except Exception as e:
+            print(f"Skipping font subsetting for {font.get('/BaseFont')}: {e}")
+
+
+def optimize_pdf(input_pdf, output, level: int = DEDUPLICATE, max_dpi: int = OPTIMIZE_MAX_DPI) -> tuple:
+    """
+    Rewrites a PDF to make it smaller.
+
+    Args:
+        input_pdf: The PDF, as a path, bytes or a binary file-like object.
+        output: Path or binary file object to write the optimized PDF to.
+        level (int): How far to go, each level including the ones below it:
+            1 stores identical objects once and drops unreferenced ones,
+            2 also recompresses content streams at the highest zlib level,
+            3 also downsamples images above max_dpi (needs Pillow),
+            4 also subsets fully embedded fonts to the glyphs used (needs fontTools).
+            0 copies the PDF unchanged.
+        max_dpi (int): Resolution images are downsampled to at level 3 and above.
+
+    Returns the sizes in bytes before and after. The original is kept if
+    optimizing would not make it smaller.
+    """
+    try:
+        if isinstance(input_pdf, str):
+            with open(input_pdf, 'rb') as f:
+                original = f.read()
+        elif isinstance(input_pdf, bytes):
+            original = input_pdf
+        else:
+            original = input_pdf.read()
+
+        optimized = original
+        if level > NONE:
+            writer = PdfWriter(clone_from=PdfReader(BytesIO(original)))
+            if level >= SUBSET_FONTS and TTFont is not None:
+                _subset_fonts(writer)
+            if level >= DOWNSAMPLE and Image is not None:
+                _downsample_images(writer, max_dpi, OPTIMIZE_JPEG_QUALITY)
+            if level >= RECOMPRESS:
+                for page in writer.pages:
+                    page.compress_content_streams(level=9)
+            writer.compress_identical_objects()
+            result = BytesIO()
+            writer.write(result)
+            if result.tell() < len(original):
+                optimized = result.getvalue()
+
+        if isinstance(output, str):
+            with open(output, 'wb') as f:
+                f.write(optimized)
+        else:
+            output.write(optimized)
+        OPTIMIZE_BYTES.labels('before').inc(len(original))
+        OPTIMIZE_BYTES.labels('after').inc(len(optimized))
+        return len(original), len(optimized)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Optimization failed: {e}")
\ No newline at end of file
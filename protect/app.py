@@ -1,36 +1,143 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import Response
-from password import protect_pdf
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from password import protect_pdf, protect_file, CIPHERS, DEFAULT_CIPHER
+from limits import install as install_limits, upload_size, MAX_FILE_SIZE
+from metrics import install as install_metrics, stage
+from cpu import cpu_quota
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from typing import List
+from zipfile import ZipFile
+import asyncio
+import multiprocessing
 import os
+import shutil
+import tempfile
+import time
 
 app = FastAPI()
+install_limits(app)
+install_metrics(app)
+
+# Worker processes used by /protect/batch; by default one per CPU of the container's quota
+PROTECT_WORKERS = int(os.environ.get("PROTECT_WORKERS", 0)) or cpu_quota()
+process_pool: ProcessPoolExecutor = None
+
+@app.on_event("startup")
+async def start_process_pool():
+    global process_pool
+    process_pool = ProcessPoolExecutor(
+        max_workers=PROTECT_WORKERS,
+        mp_context=multiprocessing.get_context('spawn')
+    )
+
+@app.on_event("shutdown")
+async def stop_process_pool():
+    process_pool.shutdown(cancel_futures=True)
 
 @app.post("/protect")
 async def protect_pdf_endpoint(
     file: UploadFile = File(...),
-    password: str = Form(...)
+    password: str = Form(...),
+    cipher: str = Form(DEFAULT_CIPHER)
 ):
     """
     Endpoint to password-protect a PDF file.
     - Uses the protect_pdf helper function
-        - Essential logic - uses the PyPDF2 library to password-protect a PDF file.
+        - Essential logic - uses the pypdf library to password-protect a PDF file.
         - Args:
-            - input_file (bytes): Byte content of the input PDF file.
+            - input_pdf (file): The uploaded PDF, read from its spooled temporary file.
             - password (str): Password to protect the PDF file.
+            - cipher (str): AES-256, AES-128, RC4-128 or RC4-40.
             
-    - Returns the password-protected PDF file as a response.
+    - Returns the password-protected PDF file as a response, with the time spent
+      encrypting in the Server-Timing header.
     
     """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Invalid file format. Please upload a PDF file.")
+    if upload_size(file) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail=f"File too large: {file.filename}")
+    if cipher not in CIPHERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported cipher. Choose one of {', '.join(CIPHERS)}.")
     
-    input_content = await file.read()
-    
+    fd, output_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
     try:
         # Protect the PDF
-        protected_pdf = protect_pdf(input_content, password)
+        start = time.perf_counter()
+        with stage('protect'):
+            await asyncio.to_thread(protect_pdf, file.file, password, output_path, cipher)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"Protected {file.filename} with {cipher} in {elapsed_ms:.1f} ms")
         
-        return Response(content=protected_pdf, media_type='application/pdf')
+        return FileResponse(
+            path=output_path,
+            media_type='application/pdf',
+            background=BackgroundTask(os.remove, output_path)
+        )
+    except Exception as e:
+        os.remove(output_path)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/protect/batch")
+async def protect_batch_endpoint(
+    files: List[UploadFile] = File(...),
+    password: str = Form(...),
+    cipher: str = Form(DEFAULT_CIPHER)
+):
+    """
+    Endpoint to password-protect many PDF files in one request.
+    - Encrypts the files concurrently on PROTECT_WORKERS worker processes
+      using the protect_file helper function
+    - Returns a zip of the protected PDFs, named <i>_protected_<filename> for
+      the i-th upload (from 0) and in upload order, with the total encryption time in a Server-Timing header.
+    """
+    for file in files:
+        if not file.filename.endswith('.pdf'):
+            raise HTTPException(status_code=400, detail=f"Invalid file format detected: {file.filename}")
+        if upload_size(file) > MAX_FILE_SIZE:
+            raise HTTPException(status_code=413, detail=f"File too large: {file.filename}")
+    if cipher not in CIPHERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported cipher. Choose one of {', '.join(CIPHERS)}.")
+
+    workdir = tempfile.mkdtemp()
+    try:
+        # Worker processes need the uploads as files of their own
+        jobs = []
+        for i, file in enumerate(files):
+            input_path = os.path.join(workdir, f"{i}.pdf")
+            output_path = os.path.join(workdir, f"{i}_protected.pdf")
+            with open(input_path, 'wb') as f:
+                await asyncio.to_thread(shutil.copyfileobj, file.file, f)
+            jobs.append((file.filename, input_path, output_path))
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        with stage('protect'):
+            await asyncio.gather(*[
+                loop.run_in_executor(process_pool, protect_file, input_path, password, output_path, cipher)
+                for _, input_path, output_path in jobs
+            ])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"Protected {len(jobs)} files with {cipher} in {elapsed_ms:.1f} ms")
+
+        zip_path = os.path.join(workdir, "protected_pdfs.zip")
+        def write_zip():
+            with ZipFile(zip_path, 'w') as zipf:
+                for i, (filename, _, output_path) in enumerate(jobs):
+                    zipf.write(output_path, arcname=f"{i}_protected_{filename}")
+        await asyncio.to_thread(write_zip)
+
+        return FileResponse(
+            path=zip_path,
+            media_type='application/zip',
+            filename="protected_pdfs.zip",
+            background=BackgroundTask(shutil.rmtree, workdir, ignore_errors=True)
+        )
     except Exception as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,27 +1,50 @@
-from PyPDF2 import PdfReader, PdfWriter
+from pypdf import PdfReader, PdfWriter
 from fastapi import HTTPException
 from io import BytesIO
+import os
 
-def protect_pdf(input_pdf: bytes, password: str) -> bytes:
+# Ciphers protect_pdf can encrypt with
+CIPHERS = ("AES-256", "AES-128", "RC4-128", "RC4-40")
+DEFAULT_CIPHER = os.environ.get("PROTECT_CIPHER", "RC4-128")
+
+def protect_pdf(input_pdf, password: str, output=None, cipher: str = DEFAULT_CIPHER) -> bytes:
     """
     Protects a PDF with a password.
+
+    The document is cloned in one pass instead of being rebuilt page by page,
+    and its streams are encrypted with the cryptography package.
     
     Args:
-        input_pdf (bytes): The original PDF file in bytes.
+        input_pdf (bytes): The original PDF file, as bytes or a binary file object.
         password (str): The password to protect the PDF with.
+        output: Optional path or binary file object to write the protected PDF to.
+            When given, the protected PDF is not returned.
+        cipher (str): One of CIPHERS.
     """
     try:
-        pdf_reader = PdfReader(BytesIO(input_pdf))
-        pdf_writer = PdfWriter()
+        pdf_reader = PdfReader(BytesIO(input_pdf) if isinstance(input_pdf, bytes) else input_pdf)
+        pdf_writer = PdfWriter(clone_from=pdf_reader)
         
-        for page in pdf_reader.pages:
-            pdf_writer.add_page(page)
-        
-        pdf_writer.encrypt(user_pwd=password)
+        pdf_writer.encrypt(user_password=password, algorithm=cipher)
         
+        if output is not None:
+            pdf_writer.write(output)
+            return None
         output = BytesIO()
         pdf_writer.write(output)
         protected_pdf = output.getvalue()
         return protected_pdf
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Password protection failed: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Password protection failed: {e}")
+
+def protect_file(input_path: str, password: str, output_path: str, cipher: str = DEFAULT_CIPHER):
+    """
+    Protects the PDF at input_path and writes it to output_path.
+    Runs in the batch endpoint's worker processes, so errors are raised as
+    RuntimeError, which unlike HTTPException survives pickling.
+    """
+    try:
+        with open(input_path, 'rb') as input_pdf:
+            protect_pdf(input_pdf, password, output_path, cipher)
+    except HTTPException as e:
+        raise RuntimeError(e.detail)
\ No newline at end of file